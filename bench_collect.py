@@ -0,0 +1,231 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from collectlib.extract import AGG_LAST, Extractor, Metric
+from collectlib.plan import Plan
+from collectlib.runner import Runner
+from collectlib.stats import mean
+from collectlib.store import ColumnStore
+from collectlib.writer import CSVWriter
+
+SUITES = ['spawn', 'stream', 'extract', 'writer', 'plan']
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('-mb', action="store", type=float, default=8, dest="mb", help="Size of the synthetic output in MB")
+parser.add_argument('-reps', action="store", type=int, default=3, dest="reps", help="Repetitions per benchmark, best time is reported")
+parser.add_argument('-o', action="store", default=None, dest="out", help="Write results as JSON to this file instead of stdout")
+parser.add_argument('-runs', action="store", type=int, default=200, dest="runs", help="Runs of the TEST_CMD stand-in for the spawn benchmark")
+parser.add_argument('-rows', action="store", type=int, default=20000, dest="rows", help="Rows written by the writer benchmark")
+parser.add_argument('-suites', action="store", default=','.join(SUITES), dest="suites", help="Comma-separated benchmarks to run: " + ','.join(SUITES))
+
+cli = parser.parse_args()
+
+GA_KEYS = ["VTX_CLs", "EDG_CLs", "Boolbuf_EDG_CLs", "UPD_CLs", "MIN_EDG_CLs"]
+
+def syntheticOutput(mb, seed=1):
+    """Verbose graph_analytics-like output: key:value noise, free text and the metrics at the end."""
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    target = int(mb * (1 << 20))
+    while size < target:
+        kind = rng.random()
+        if kind < 0.6:
+            line = "iter_%d_frontier : %d" % (rng.randrange(1000), rng.randrange(1 << 30))
+        elif kind < 0.9:
+            line = "[debug] processing block %d of %d" % (rng.randrange(1 << 20), 1 << 20)
+        else:
+            line = "stage=%d" % rng.randrange(100)
+        lines.append(line)
+        size += len(line) + 1
+    for key in GA_KEYS:
+        lines.append("%s : %d" % (key, rng.randrange(1 << 40)))
+    lines.append("Running time : 8.27")
+    return lines
+
+# The per-script parsers as they were before the shared engine
+def legacyGeneric(lines):
+    for line in lines:
+        vals = line.strip().split(":")
+        if vals[0].strip() == "Running time":
+            return {'runtime': vals[1].strip()}
+    return {'runtime': '---'}
+
+def legacyGA(lines):
+    data = {}
+    for line in lines:
+        vals = line.strip().split(":")
+        vals[0] = vals[0].strip()
+        if vals[0] in GA_KEYS:
+            data[vals[0]] = vals[1].strip()
+    return data
+
+def legacyDict(lines):
+    data = {}
+    for line in lines:
+        vals = line.strip().split(":")
+        if len(vals) < 2:
+            continue
+        try:
+            data[vals[0]] = float(vals[1])
+        except ValueError:
+            data[vals[0]] = vals[1]
+    return data
+
+def best(fn, reps):
+    times = []
+    for i in range(reps):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# Both sides start from the decoded output text, as the runners see it
+def benchExtraction(text, reps):
+    mb = len(text) / float(1 << 20)
+    cases = {
+        'legacy_generic': lambda: legacyGeneric(text.split('\n')),
+        'engine_generic': lambda: Extractor([Metric('Running time', 'runtime', 'float')]).extractText(text),
+        'legacy_graph_analytics': lambda: legacyGA(text.split('\n')),
+        'engine_graph_analytics': lambda: Extractor([Metric(k, type='int', agg=AGG_LAST) for k in GA_KEYS]).extractText(text),
+        'legacy_dict': lambda: legacyDict(text.split('\n')),
+        'engine_dict': lambda: Extractor([], captureAll=True).extractText(text),
+    }
+    results = []
+    for name, fn in cases.items():
+        secs = best(fn, reps)
+        results.append({'bench': 'extract', 'case': name, 'mb': round(mb, 2), 'seconds': secs, 'mb_per_s': mb / secs})
+    return results
+
+# The collectors' -t stand-in
+TEST_CMD = ["printf", "Running time : 8.27\nhi:hello\nbye:farewell\ngreet:howdy"]
+
+def percentile(vals, pct):
+    vals = sorted(vals)
+    return vals[min(len(vals) - 1, int(round(pct / 100.0 * (len(vals) - 1))))]
+
+def latencyRecord(case, times):
+    return {'bench': 'spawn', 'case': case, 'runs': len(times), 'mean_ms': 1e3 * mean(times),
+            'p50_ms': 1e3 * percentile(times, 50), 'p95_ms': 1e3 * percentile(times, 95)}
+
+# Fixed cost of one run: fork/exec, pipe plumbing, wait4 and parsing a tiny output
+def benchSpawn(runs):
+    runner = Runner(TEST_CMD)
+    extractor = Extractor([Metric('Running time', 'runtime', 'float')])
+    cases = {
+        'check_output': lambda: subprocess.check_output(TEST_CMD),
+        'execToLines': lambda: runner.execToLines(['x'], quiet=True),
+        'execStream': lambda: runner.execStream(['x'], extractor, quiet=True),
+        'execStream_timeouts': lambda: runner.execStream(['x'], extractor, timeout=60, quiet=True, idleTimeout=60),
+    }
+    results = []
+    for name, fn in cases.items():
+        times = []
+        for i in range(runs):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        results.append(latencyRecord(name, times))
+    return results
+
+# End to end: a child writing the synthetic output through the pipe into each engine
+def benchStream(text, reps):
+    mb = len(text) / float(1 << 20)
+    fd, path = tempfile.mkstemp(prefix="bench-", suffix=".txt")
+    with os.fdopen(fd, 'w') as outFile:
+        outFile.write(text)
+    runner = Runner(["cat", path])
+    cases = {
+        'execToLines_generic': lambda: legacyGeneric(runner.execToLines(['x'], quiet=True)),
+        'execStream_generic': lambda: runner.execStream(['x'], Extractor([Metric('Running time', 'runtime', 'float')]), quiet=True),
+        'execStream_graph_analytics': lambda: runner.execStream(['x'], Extractor([Metric(k, type='int', agg=AGG_LAST) for k in GA_KEYS]), quiet=True),
+        'execStream_dict': lambda: runner.execStream(['x'], Extractor([], captureAll=True), quiet=True),
+    }
+    results = []
+    try:
+        for name, fn in cases.items():
+            secs = best(fn, reps)
+            results.append({'bench': 'stream', 'case': name, 'mb': round(mb, 2), 'seconds': secs, 'mb_per_s': mb / secs})
+    finally:
+        os.remove(path)
+    return results
+
+# CSVWriter flushes every row; the store batches them
+def benchWriter(rows):
+    row = {'app': 'bfs', 'threads': 16, 'start_vtx': 7414634, 'graphs': 'S23-E8', 'runtime': 8.27, 'wall_s': 8.301, 'status': 'ok'}
+    tmp = tempfile.mkdtemp(prefix="bench-")
+    results = []
+    try:
+        writer = CSVWriter(os.path.join(tmp, "out.csv"))
+        start = time.perf_counter()
+        for i in range(rows):
+            writer.writeRow(row)
+        secs = time.perf_counter() - start
+        writer.close()
+        results.append({'bench': 'writer', 'case': 'csv_writeRow', 'rows': rows, 'seconds': secs, 'rows_per_s': rows / secs, 'us_per_row': 1e6 * secs / rows})
+
+        writer = ColumnStore(os.path.join(tmp, "store")).writer()
+        start = time.perf_counter()
+        for i in range(rows):
+            writer.writeRow(row)
+        writer.close()
+        secs = time.perf_counter() - start
+        results.append({'bench': 'writer', 'case': 'store_writeRow', 'rows': rows, 'seconds': secs, 'rows_per_s': rows / secs, 'us_per_row': 1e6 * secs / rows})
+    finally:
+        shutil.rmtree(tmp)
+    return results
+
+# Config iteration as run() does it, on a generic_collect-shaped space
+def benchPlan(reps):
+    graphs = [{'name': 'G%d' % g, 'cmd': ['/inputs/g%d.g' % g]} for g in range(16)]
+    config = {
+        'app': [{'name': 'bfs', 'cmd': ['./BFS']}],
+        'base': ['-rounds 1'],
+        'threads': [{'name': t, 'cmd': ['-w', str(t)]} for t in range(1, 65)],
+        'graphs': graphs,
+        'start_vtx': dict((g['name'], [{'name': v, 'cmd': ['-r', str(v)]} for v in range(8)]) for g in graphs),
+    }
+    plan = Plan(config, ['app', 'base', 'threads', 'start_vtx', 'graphs'], {}, {'start_vtx': 'graphs'})
+    count = len(plan)
+    # case -> (fn, operations it performs)
+    cases = {
+        'iterate': (lambda: sum(1 for cell in plan), count),
+        'len': (lambda: len(Plan(config, ['app', 'base', 'threads', 'start_vtx', 'graphs'], {}, {'start_vtx': 'graphs'})), 1),
+        'index': (lambda: [plan[i * (count // 1000)] for i in range(1000)], 1000),
+    }
+    results = []
+    for name, (fn, ops) in cases.items():
+        secs = best(fn, reps)
+        results.append({'bench': 'plan', 'case': name, 'configs': count, 'ops': ops, 'seconds': secs, 'us_per_op': 1e6 * secs / ops})
+    return results
+
+suites = [s.strip() for s in cli.suites.split(',') if s.strip()]
+unknown = [s for s in suites if s not in SUITES]
+if unknown:
+    parser.error("Unknown suite(s): " + ', '.join(unknown))
+if not suites:
+    parser.error("No suite given")
+text = '\n'.join(syntheticOutput(cli.mb))
+results = []
+if 'spawn' in suites:
+    results += benchSpawn(cli.runs)
+if 'stream' in suites:
+    results += benchStream(text, cli.reps)
+if 'extract' in suites:
+    results += benchExtraction(text, cli.reps)
+if 'writer' in suites:
+    results += benchWriter(cli.rows)
+if 'plan' in suites:
+    results += benchPlan(cli.reps)
+
+out = open(cli.out, 'w') if cli.out else sys.stdout
+json.dump(results, out, indent=2)
+out.write('\n')
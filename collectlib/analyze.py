@@ -0,0 +1,238 @@
+import os
+import csv
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from collectlib.extract import MISSING, toNumber
+from collectlib.runner import STATUS_OK
+from collectlib.store import ColumnStore
+
+# Columns the collectors write as run labels; everything else is a measurement
+LABELS = ['app', 'exec', 'graph', 'graphs', 'processor', 'threads', 'start_vtx', 'scale', 'op', 'rep']
+
+def loadResults(paths):
+    """Result CSVs and/or store directories -> (dict of column name -> list, row count).
+
+    Columns a file does not have are filled with MISSING, as in a merge.
+    """
+    columns = {}
+    count = 0
+    def add(block, rows):
+        nonlocal count
+        for name in block:
+            if name not in columns:
+                columns[name] = [MISSING] * count
+        for name, vals in columns.items():
+            vals += block[name] if name in block else [MISSING] * rows
+        count += rows
+
+    for path in paths:
+        if os.path.isdir(path):
+            for segment in ColumnStore(path).segments():
+                add(segment.columns(segment.columnNames()), len(segment))
+        else:
+            with open(path, newline='') as inFile:
+                reader = csv.reader(inFile)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                block = dict((name, []) for name in header)
+                lists = [block[name] for name in header]
+                for row in reader:
+                    for vals, val in zip(lists, row):
+                        vals.append(val)
+                add(block, len(lists[0]) if lists else 0)
+    return columns, count
+
+def _float(val):
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return float(val)
+    try:
+        return float(toNumber(val))
+    except (TypeError, ValueError):
+        return math.nan
+
+def _sortKey(key):
+    # numeric labels (threads, scale) sort by value, others by name
+    out = []
+    for val in key:
+        try:
+            out.append((0, toNumber(val), ''))
+        except (TypeError, ValueError):
+            out.append((1, 0, str(val)))
+    return out
+
+class Results:
+    """Loaded result columns (see loadResults), parsed once for the group-bys
+    of every table: each metric as floats with NaN where it is missing, the
+    ok rows and, with numpy, each label column as integer codes."""
+    def __init__(self, columns, count):
+        self.columns = columns
+        self.count = count
+        self._values = {}
+        self._codes = {}
+        self._ok = None
+
+    def values(self, name):
+        if name not in self._values:
+            vals = [_float(v) for v in self.columns[name]]
+            self._values[name] = numpy.asarray(vals, dtype=float) if numpy is not None else vals
+        return self._values[name]
+
+    def ok(self):
+        if self._ok is None:
+            status = self.columns.get('status')
+            ok = [s in (STATUS_OK, MISSING, '') for s in status] if status else [True] * self.count
+            self._ok = numpy.asarray(ok, dtype=bool) if numpy is not None else ok
+        return self._ok
+
+    def codes(self, name):
+        """(distinct values as strings, code of every row) of a label column."""
+        if name not in self._codes:
+            index = {}
+            codes = numpy.fromiter((index.setdefault(str(v), len(index)) for v in self.columns[name]), dtype=numpy.int64, count=self.count)
+            self._codes[name] = (list(index), codes)
+        return self._codes[name]
+
+def _groupNumpy(results, by, value):
+    vals = results.values(value)
+    rows = numpy.flatnonzero(results.ok() & ~numpy.isnan(vals))
+    if not len(rows):
+        return []
+    # the label codes combined into one integer per row, re-coded densely
+    # whenever the next column could overflow it
+    combined = numpy.zeros(len(rows), dtype=numpy.int64)
+    size = 1
+    for k in by:
+        names, codes = results.codes(k)
+        if size * len(names) >= 1 << 62:
+            combined = numpy.unique(combined, return_inverse=True)[1].reshape(-1)
+            size = int(combined.max()) + 1
+        combined = combined * len(names) + codes[rows]
+        size *= len(names)
+    groups, first, inv = numpy.unique(combined, return_index=True, return_inverse=True)
+    inv = inv.reshape(-1)
+    vals = vals[rows]
+    counts = numpy.bincount(inv, minlength=len(groups))
+    means = numpy.bincount(inv, weights=vals, minlength=len(groups)) / counts
+    dev = vals - means[inv]
+    m2 = numpy.bincount(inv, weights=dev * dev, minlength=len(groups))
+    labels = [results.codes(k) for k in by]
+    out = []
+    for g, row in enumerate(rows[first]):
+        key = tuple(names[codes[row]] for names, codes in labels)
+        out.append((key, int(counts[g]), float(means[g]), float(m2[g])))
+    return out
+
+def _groupPython(results, by, value):
+    # Welford's update, so identical runs give a spread of exactly 0
+    vals = results.values(value)
+    ok = results.ok()
+    keyCols = [[str(v) for v in results.columns[k]] for k in by]
+    acc = {}
+    for i, key in enumerate(zip(*keyCols) if by else [()] * results.count):
+        val = vals[i]
+        if not ok[i] or math.isnan(val):
+            continue
+        entry = acc.get(key)
+        if entry is None:
+            acc[key] = [1, val, 0.0]
+        else:
+            entry[0] += 1
+            delta = val - entry[1]
+            entry[1] += delta / entry[0]
+            entry[2] += delta * (val - entry[1])
+    return [(key, n, m, m2) for key, (n, m, m2) in acc.items()]
+
+def groupStats(results, by, value):
+    """[(key tuple, n, mean, std)] of value over ok rows, grouped by the by columns.
+
+    The group-by runs on numpy arrays when numpy is installed and falls back
+    to one pass in Python otherwise; the results are the same.
+    """
+    groups = (_groupNumpy if numpy is not None else _groupPython)(results, by, value)
+    out = []
+    for key, n, m, m2 in groups:
+        std = math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+        out.append((key, n, m, std))
+    return sorted(out, key=lambda g: _sortKey(g[0]))
+
+def geomean(vals):
+    vals = [v for v in vals if v > 0]
+    if not vals:
+        return math.nan
+    return math.exp(sum(math.log(v) for v in vals) / len(vals))
+
+def startVertexTable(results, value, by):
+    """Mean and spread of value over the start vertices (and repetitions) of each config."""
+    keys = [k for k in by if k not in ('start_vtx', 'rep')]
+    return [dict(zip(keys, key), **{'runs': n, value: m, value + '_std': std})
+            for key, n, m, std in groupStats(results, keys, value)]
+
+def speedupTable(results, value, by, column='processor', baseline='cpu', target='fpga'):
+    """Per config speedup of target over baseline (value is a time), plus per app geomeans."""
+    keys = [k for k in by if k not in (column, 'start_vtx', 'rep')]
+    means = dict((key, m) for key, n, m, std in groupStats(results, keys + [column], value))
+    rows = []
+    for key in sorted(set(k[:-1] for k in means), key=_sortKey):
+        base, other = means.get(key + (baseline,)), means.get(key + (target,))
+        if base is None or not other:
+            continue
+        rows.append(dict(zip(keys, key), **{baseline: base, target: other, 'speedup': base / other}))
+    summary = []
+    if 'app' in keys:
+        for app in sorted(set(r['app'] for r in rows)):
+            speedups = [r['speedup'] for r in rows if r['app'] == app]
+            summary.append({'app': app, 'configs': len(speedups), 'geomean_speedup': geomean(speedups)})
+    return rows, summary
+
+def efficiencyTable(results, value, by, threads='threads'):
+    """Speedup and parallel efficiency over the thread count, per config.
+
+    The smallest thread count of a config is the base: speedup(p) =
+    T(base) / T(p) and efficiency(p) = base * T(base) / (p * T(p)).
+    """
+    keys = [k for k in by if k not in (threads, 'start_vtx', 'rep')]
+    stats = groupStats(results, keys + [threads], value)
+    curves = {}
+    for key, n, m, std in stats:
+        try:
+            curves.setdefault(key[:-1], []).append((toNumber(key[-1]), m))
+        except ValueError:
+            continue
+    rows = []
+    for key in sorted(curves, key=_sortKey):
+        points = sorted(curves[key])
+        baseThreads, baseTime = points[0]
+        for p, t in points:
+            if not t:
+                continue
+            rows.append(dict(zip(keys, key), **{threads: p, value: t, 'speedup': baseTime / t,
+                                                'efficiency': baseThreads * baseTime / (p * t)}))
+    return rows
+
+def formatValue(val):
+    if isinstance(val, float):
+        return MISSING if math.isnan(val) else "%.6g" % val
+    return str(val)
+
+def writeTable(rows, out=None, path=None):
+    """Prints rows tab-separated, or writes them as a CSV to path."""
+    if not rows:
+        return 0
+    header = list(rows[0])
+    if path:
+        with open(path, 'w', newline='') as outFile:
+            writer = csv.DictWriter(outFile, header)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(dict((k, formatValue(v)) for k, v in row.items()))
+    else:
+        print('\t'.join(header), file=out)
+        for row in rows:
+            print('\t'.join(formatValue(row.get(k, '')) for k in header), file=out)
+    return len(rows)
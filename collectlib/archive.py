@@ -0,0 +1,227 @@
+import os
+import json
+import lzma
+import time
+import uuid
+import zlib
+import hashlib
+import itertools
+import threading
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+from collectlib.extract import Extractor
+from collectlib.runner import pipedPrint
+
+# Blob suffix per compression: lzma packs the repetitive per-iteration
+# output of the binaries tighter, zlib costs less CPU during the sweep
+COMPRESSIONS = {'lzma': '.xz', 'zlib': '.zz'}
+LZMA_PRESET = 6
+ZLIB_LEVEL = 6
+INDEX = 'index.jsonl'
+RUN_ID = 'run_id'
+# Runs handed to a worker at once, and chunks in flight per worker
+CHUNK = 32
+CHUNKS_PER_WORKER = 4
+
+class _Blob:
+    """One output stream, hashed and compressed chunk by chunk into a temp file."""
+    def __init__(self, tmpDir, compression):
+        self.suffix = COMPRESSIONS[compression]
+        self.size = 0
+        self._hash = hashlib.blake2b(digest_size=20)
+        self._comp = lzma.LZMACompressor(preset=LZMA_PRESET) if compression == 'lzma' else zlib.compressobj(ZLIB_LEVEL)
+        self.tmp = os.path.join(tmpDir, uuid.uuid4().hex)
+        self._file = open(self.tmp, 'wb')
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        self._file.write(self._comp.compress(data))
+
+    def finish(self):
+        """The blob's name (content hash and suffix) once the stream is complete."""
+        self._file.write(self._comp.flush())
+        self._file.close()
+        return self._hash.hexdigest() + self.suffix
+
+    def discard(self):
+        self._file.close()
+        os.remove(self.tmp)
+
+class Recording:
+    """The stdout and stderr of one run of cmd, as Runner.execStream writes them."""
+    def __init__(self, tmpDir, compression, cmd):
+        self.cmd = list(cmd)
+        self.stdout = _Blob(tmpDir, compression)
+        self.stderr = _Blob(tmpDir, compression)
+
+    def discard(self):
+        self.stdout.discard()
+        self.stderr.discard()
+
+def readBlob(path, name):
+    with open(os.path.join(path, 'objects', name[:2], name), 'rb') as inFile:
+        data = inFile.read()
+    return lzma.decompress(data) if name.endswith(COMPRESSIONS['lzma']) else zlib.decompress(data)
+
+class OutputArchive:
+    """Compressed raw output of every run, so new metrics can be extracted
+    later without running anything again.
+
+    Each stream is stored once under objects/, named by the hash of its
+    content, so identical outputs share a file. index.jsonl gets one line
+    per run: its run ID, the result row as written, which of the row's
+    columns came from the extractor, the extractor itself and the blobs of
+    its stdout and stderr.
+    """
+    def __init__(self, path, compression='lzma'):
+        if compression not in COMPRESSIONS:
+            raise ValueError("Unknown compression: " + str(compression))
+        self.path = path
+        self.compression = compression
+        self.stored = 0
+        self.rawBytes = 0
+        self._lock = threading.Lock()
+        self._tmp = os.path.join(path, 'tmp')
+        os.makedirs(self._tmp, exist_ok=True)
+        os.makedirs(os.path.join(path, 'objects'), exist_ok=True)
+
+    def recording(self, cmd):
+        return Recording(self._tmp, self.compression, cmd)
+
+    def _store(self, blob):
+        name = blob.finish()
+        path = os.path.join(self.path, 'objects', name[:2], name)
+        if os.path.exists(path):
+            os.remove(blob.tmp)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(blob.tmp, path)
+        return name
+
+    def add(self, recording, row, data, extractor=None):
+        """Files a finished run whose result row is row (data being the
+        extracted part); returns the row with its run ID added."""
+        row = dict(row, **{RUN_ID: uuid.uuid4().hex[:16]})
+        entry = {"run_id": row[RUN_ID], "time": time.time(), "cmd": recording.cmd, "row": row, "data_columns": list(data),
+                 "extractor": extractor.toDict() if hasattr(extractor, 'toDict') else None,
+                 "stdout": self._store(recording.stdout), "stdout_bytes": recording.stdout.size,
+                 "stderr": self._store(recording.stderr), "stderr_bytes": recording.stderr.size}
+        line = json.dumps(entry, default=str) + '\n'
+        with self._lock:
+            with open(os.path.join(self.path, INDEX), 'a') as outFile:
+                outFile.write(line)
+            self.stored += 1
+            self.rawBytes += recording.stdout.size + recording.stderr.size
+        return row
+
+    def entries(self, where=None):
+        """Index entries in the order the runs finished, optionally only those
+        whose row has the given label values."""
+        try:
+            inFile = open(os.path.join(self.path, INDEX))
+        except OSError:
+            return
+        with inFile:
+            for line in inFile:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line of a sweep that was killed mid-write
+                    continue
+                if where and any(str(entry["row"].get(k)) != v for k, v in where.items()):
+                    continue
+                yield entry
+
+    def read(self, name):
+        return readBlob(self.path, name)
+
+    def report(self):
+        size = 0
+        for root, dirs, files in os.walk(os.path.join(self.path, 'objects')):
+            size += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        pipedPrint("Archive: %d runs stored (%.1f MB of output); %s holds %.1f MB" % (self.stored, self.rawBytes / 1e6, self.path, size / 1e6))
+
+def _rowWithData(row, dataColumns, data):
+    # the new values go where the old extracted columns were (or before wall_s)
+    out = {}
+    placed = False
+    for key, val in row.items():
+        if not placed and (key in dataColumns or key == 'wall_s'):
+            out.update(data)
+            placed = True
+        if key not in dataColumns:
+            out[key] = val
+    if not placed:
+        out.update(data)
+    return out
+
+_extractors = {}
+
+def _reextract(job):
+    path, entry, spec = job
+    key = json.dumps(spec, sort_keys=True)
+    extractor = _extractors.get(key)
+    if extractor is None:
+        extractor = _extractors[key] = Extractor.fromDict(spec)
+    data = extractor.extractText(readBlob(path, entry["stdout"]).decode(errors='replace'))
+    return _rowWithData(entry["row"], entry["data_columns"], data)
+
+def _reextractChunk(jobs):
+    return [_reextract(job) for job in jobs]
+
+def _chunks(items, size):
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+def extractorSpec(entry, metrics=None, keepMetrics=False, captureAll=False):
+    """What to extract from an archived run: its own extractor, the given
+    metrics instead, or (keepMetrics) both; None if that is not known."""
+    if metrics and not keepMetrics:
+        return Extractor(metrics, captureAll=captureAll).toDict()
+    if entry["extractor"] is None:
+        return None
+    if not metrics and not captureAll:
+        return entry["extractor"]
+    own = Extractor.fromDict(entry["extractor"])
+    return Extractor(own.metrics + list(metrics or []), own.sep, own.captureAll or captureAll, own.captureType).toDict()
+
+def reextract(archive, writer, metrics=None, keepMetrics=False, captureAll=False, where=None, jobs=None):
+    """Writes the row of every archived run again with values extracted from
+    its archived stdout, spread over jobs processes (default: one per core).
+    Work goes out in chunks, only a few per worker at a time, so a large
+    archive is not read into the queue up front. Returns the number of rows
+    written and of runs skipped because their extractor was not archived."""
+    skipped = [0]
+    def tasks():
+        for entry in archive.entries(where):
+            spec = extractorSpec(entry, metrics, keepMetrics, captureAll)
+            if spec is None:
+                skipped[0] += 1
+                continue
+            yield archive.path, entry, spec
+
+    written = 0
+    if jobs == 1:
+        for task in tasks():
+            writer.writeRow(_reextract(task))
+            written += 1
+    else:
+        workers = jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = _chunks(tasks(), CHUNK)
+            window = workers * CHUNKS_PER_WORKER
+            pending = collections.deque(executor.submit(_reextractChunk, chunk) for chunk in itertools.islice(chunks, window))
+            while pending:
+                rows = pending.popleft().result()
+                chunk = next(chunks, None)
+                if chunk:
+                    pending.append(executor.submit(_reextractChunk, chunk))
+                writer.writeRows(rows)
+                written += len(rows)
+    return written, skipped[0]
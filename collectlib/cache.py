@@ -0,0 +1,172 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+from collectlib.runner import STATUS_OK, RunResult, pipedPrint
+
+# A graph file is fingerprinted from its size, mtime and this many evenly
+# spaced blocks instead of being read in full.
+SAMPLE_BLOCKS = 8
+SAMPLE_SIZE = 1 << 16
+HASH_BLOCK = 1 << 20
+# Row column telling cached results (1) from runs made in this sweep (0)
+CACHED = 'cached'
+
+_hashes = {}
+_hashLock = threading.Lock()
+
+def _memoized(path, kind, fn):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "missing"
+    memo = (kind, os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    with _hashLock:
+        if memo in _hashes:
+            return _hashes[memo]
+    digest = fn(path, st)
+    with _hashLock:
+        _hashes[memo] = digest
+    return digest
+
+def _fullHash(path, st):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as inFile:
+        while True:
+            block = inFile.read(HASH_BLOCK)
+            if not block:
+                break
+            h.update(block)
+    return h.hexdigest()
+
+def _sampledHash(path, st):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(st.st_size).encode())
+    h.update(str(st.st_mtime_ns).encode())
+    with open(path, 'rb') as inFile:
+        step = max(1, st.st_size // SAMPLE_BLOCKS)
+        for offset in range(0, st.st_size, step):
+            inFile.seek(offset)
+            h.update(inFile.read(SAMPLE_SIZE))
+    return h.hexdigest()
+
+def fileHash(path):
+    """Content hash of a whole file (executables, bitstreams)."""
+    return _memoized(path, 'full', _fullHash)
+
+def fileFingerprint(path):
+    """Cheap fingerprint of a large input: size, mtime and sampled blocks."""
+    return _memoized(path, 'sampled', _sampledHash)
+
+def extractorSignature(extractor):
+    if hasattr(extractor, 'signature'):
+        return extractor.signature()
+    fn = getattr(extractor, 'fn', extractor)
+    return getattr(fn, '__module__', '') + '.' + getattr(fn, '__qualname__', type(fn).__name__)
+
+class ResultCache:
+    """Persistent cache of successful run results, keyed by content.
+
+    The key covers a hash of the executable, a fingerprint of every
+    argument that names a file (the graph), the full argument list, the
+    extractor and any extra context such as the programmed bitstream, so
+    changing any of them misses. Entries are small JSON files; refresh
+    ignores existing entries but still stores new results.
+    """
+    def __init__(self, path, refresh=False):
+        self.path = path
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, cmd, extractor, extra=None):
+        exe = cmd[0]
+        if os.sep not in exe:
+            exe = shutil.which(exe) or exe
+        parts = [fileHash(exe), list(cmd), extractorSignature(extractor)]
+        parts.append([fileFingerprint(arg) for arg in cmd[1:] if os.path.isfile(arg)])
+        if extra:
+            parts.append(sorted(extra.items()))
+        return hashlib.blake2b(json.dumps(parts, default=str).encode(), digest_size=20).hexdigest()
+
+    def _entryPath(self, key):
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    def get(self, key):
+        """The cached RunResult (with cached set) or None."""
+        entry = None
+        if not self.refresh:
+            try:
+                with open(self._entryPath(key)) as inFile:
+                    entry = json.load(inFile)
+            except (OSError, ValueError):
+                entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        res = RunResult(STATUS_OK, entry["data"], 0, entry.get("wall"), entry.get("usage"), entry.get("counters"))
+        res.cached = True
+        return res
+
+    def put(self, key, res, cmd=None):
+        if not res.ok:
+            return
+        entry = {"created": time.time(), "cmd": cmd, "data": res.data, "wall": res.wall,
+                 "usage": res.usage, "counters": res.counters}
+        path = self._entryPath(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + '.%d.tmp' % threading.get_ident()
+        with open(tmp, 'w') as outFile:
+            json.dump(entry, outFile)
+        os.replace(tmp, path)
+        with self._lock:
+            self.stored += 1
+
+    def _entries(self):
+        for root, dirs, files in os.walk(self.path):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, st.st_mtime, st.st_size
+
+    def evict(self, maxAge=None, maxBytes=None):
+        """Drops entries older than maxAge seconds, then the oldest ones until
+        the cache fits in maxBytes; returns the number removed."""
+        entries = sorted(self._entries(), key=lambda e: e[1])
+        now = time.time()
+        keep = []
+        removed = 0
+        for path, mtime, size in entries:
+            if maxAge is not None and now - mtime > maxAge:
+                os.remove(path)
+                removed += 1
+            else:
+                keep.append((path, size))
+        if maxBytes is not None:
+            total = sum(size for path, size in keep)
+            for path, size in keep:
+                if total <= maxBytes:
+                    break
+                os.remove(path)
+                total -= size
+                removed += 1
+        return removed
+
+    def report(self):
+        entries = list(self._entries())
+        size = sum(e[2] for e in entries)
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        pipedPrint("Cache: %d hits, %d misses (%.0f%% hit rate), %d stored; %s holds %d entries, %.1f MB" % (self.hits, self.misses, rate, self.stored, self.path, len(entries), size / 1e6))
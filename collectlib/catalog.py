@@ -0,0 +1,204 @@
+import os
+import re
+import json
+
+from collectlib.cache import fileFingerprint
+from collectlib.runner import pipedPrint
+from collectlib.startvtx import LigraGraph
+
+# File suffix -> format, longest first so _pr64.b is not taken for .b
+FORMATS = [
+    ('_pr64.b', 'pr64'),
+    ('_sssp.b', 'sssp'),
+    ('_bfs.b', 'bfs'),
+    ('_pr.b', 'pr32'),
+    ('.w.g', 'ligra-weighted'),
+    ('.g', 'ligra'),
+]
+LIGRA_FORMATS = ('ligra', 'ligra-weighted')
+
+# Display names of graphs whose file stem is not of the sNN_eMM (RMAT) form
+KNOWN_NAMES = {
+    'higgs-social_network': 'Higgs',
+    'soc-pokec-relationships': 'Pokec',
+    'sx-stackoverflow': 'StackOverflow',
+    'as-skitter': 'Skitter',
+    'soc-LiveJournal1': 'LiveJournal',
+    'com-orkut': 'Orkut',
+    'twitter': 'Twitter',
+}
+
+# Size classes by file size, each up to its limit in bytes
+SIZE_CLASSES = [('small', 1 << 30), ('medium', 8 << 30), ('large', None)]
+
+def graphFormat(filename):
+    """(format, stem) of a graph file name, or (None, name) if it is not one."""
+    for suffix, fmt in FORMATS:
+        if filename.endswith(suffix):
+            return fmt, filename[:-len(suffix)]
+    return None, filename
+
+def displayName(filename):
+    """S23-E8, Higgs, ... for a graph file of any format.
+
+    The d_ prefix of the graph_analytics files and the per-app suffixes are
+    dropped, so every format of a graph gets the same name.
+    """
+    fmt, stem = graphFormat(os.path.basename(filename))
+    if stem.startswith('d_'):
+        stem = stem[2:]
+    rmat = re.match(r'^s(\d+)_e(\d+)$', stem)
+    if rmat:
+        return 'S%s-E%s' % rmat.groups()
+    return KNOWN_NAMES.get(stem, stem)
+
+def sizeClass(size):
+    for name, limit in SIZE_CLASSES:
+        if limit is None or size <= limit:
+            return name
+
+def _readHeader(path, fmt):
+    # only the Ligra text files describe themselves; the .b layout is private to graph_analytics
+    if fmt not in LIGRA_FORMATS:
+        return None, None
+    try:
+        with LigraGraph(path) as graph:
+            return graph.n, graph.m
+    except (OSError, ValueError):
+        return None, None
+
+class GraphCatalog:
+    """Persistent index of the graph files under a set of directories.
+
+    Every graph file gets an entry with its display name, format, vertex
+    and edge counts (Ligra headers only), size, size class and a content
+    fingerprint. refresh() re-lists only directories whose mtime changed and
+    re-reads only files whose size or mtime changed, so a launch against an
+    unchanged tree costs one stat per directory and per file.
+    """
+    def __init__(self, path, roots):
+        self.path = path
+        self.roots = [os.path.abspath(r) for r in roots]
+        self.graphs = {}
+        self._dirs = {}
+        try:
+            with open(path) as inFile:
+                index = json.load(inFile)
+            self.graphs = index.get("graphs", {})
+            self._dirs = index.get("dirs", {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as outFile:
+            json.dump({"graphs": self.graphs, "dirs": self._dirs}, outFile, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def _listDir(self, path, st):
+        entry = self._dirs.get(path)
+        if entry is not None and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry
+        files, subdirs = [], []
+        with os.scandir(path) as it:
+            for e in it:
+                if e.is_dir():
+                    subdirs.append(e.name)
+                elif graphFormat(e.name)[0]:
+                    files.append(e.name)
+        entry = {"mtime_ns": st.st_mtime_ns, "files": sorted(files), "subdirs": sorted(subdirs)}
+        self._dirs[path] = entry
+        return entry
+
+    def _updateFile(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        entry = self.graphs.get(path)
+        if entry is not None and entry["bytes"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return False
+        fmt, stem = graphFormat(os.path.basename(path))
+        vertices, edges = _readHeader(path, fmt)
+        self.graphs[path] = {"name": displayName(path), "format": fmt, "vertices": vertices, "edges": edges,
+                             "bytes": st.st_size, "size_class": sizeClass(st.st_size),
+                             "mtime_ns": st.st_mtime_ns, "fingerprint": fileFingerprint(path)}
+        return True
+
+    def refresh(self, quiet=False):
+        """Brings the index up to date with the files; returns the number of
+        entries added, changed or removed."""
+        seen, visited = set(), set()
+        changed = 0
+        stack = list(self.roots)
+        while stack:
+            path = stack.pop()
+            try:
+                st = os.stat(path)
+                entry = self._listDir(path, st)
+            except OSError:
+                continue
+            visited.add(path)
+            stack += [os.path.join(path, d) for d in entry["subdirs"]]
+            for name in entry["files"]:
+                filePath = os.path.join(path, name)
+                seen.add(filePath)
+                changed += self._updateFile(filePath)
+        for filePath in [p for p in self.graphs if p not in seen]:
+            del self.graphs[filePath]
+            changed += 1
+        for dirPath in [p for p in self._dirs if p not in visited]:
+            del self._dirs[dirPath]
+        if changed:
+            self.save()
+        if not quiet:
+            pipedPrint("Graph catalog: %d graphs, %d updated" % (len(self.graphs), changed))
+        return changed
+
+    def entries(self, format=None, sizeClasses=None):
+        """Entries (with their path) sorted by size, optionally of one format
+        and within the given size classes."""
+        out = [dict(entry, path=path) for path, entry in self.graphs.items()
+               if (format is None or entry["format"] == format)
+               and (not sizeClasses or entry["size_class"] in sizeClasses)]
+        return sorted(out, key=lambda e: e["bytes"])
+
+    def find(self, name, format=None):
+        """The entry of a graph by display name (and format), or None."""
+        for entry in self.entries(format):
+            if entry["name"] == name:
+                return entry
+        return None
+
+    def lookup(self, path):
+        entry = self.graphs.get(os.path.abspath(path))
+        return dict(entry, path=os.path.abspath(path)) if entry else None
+
+    def sizes(self, formats=None):
+        """dict of display name -> edge count (bytes where the header has none)."""
+        out = {}
+        for entry in self.entries():
+            if formats and entry["format"] not in formats:
+                continue
+            out.setdefault(entry["name"], entry["edges"] if entry["edges"] is not None else entry["bytes"])
+        return out
+
+def parseSizeClasses(spec):
+    classes = [c.strip() for c in spec.split(',') if c.strip()]
+    unknown = [c for c in classes if c not in [name for name, limit in SIZE_CLASSES]]
+    if unknown:
+        raise ValueError("Unknown size class(es): " + ', '.join(unknown))
+    return classes
+
+def selectGraphs(catalog, graphs, sizeClasses=None):
+    """Resolves name/cmd graph pairs through the catalog: a file that is not
+    where the collector expects it is looked up by name and format, and with
+    sizeClasses graphs of other classes (or not in the catalog) are dropped."""
+    out = []
+    for graph in graphs:
+        path = graph["cmd"][-1]
+        entry = catalog.lookup(path) or catalog.find(graph["name"], graphFormat(os.path.basename(path))[0])
+        if sizeClasses and (entry is None or entry["size_class"] not in sizeClasses):
+            continue
+        out.append(dict(graph, cmd=graph["cmd"][:-1] + [entry["path"]]) if entry else graph)
+    return out
@@ -0,0 +1,77 @@
+import math
+import random
+
+from collectlib.analyze import LABELS, _float, _sortKey, geomean
+from collectlib.extract import MISSING
+from collectlib.runner import STATUS_OK
+from collectlib.stats import bootstrapRatio, mannWhitney, mean
+
+VERDICT_REGRESSION = 'regression'
+VERDICT_IMPROVEMENT = 'improvement'
+VERDICT_SAME = 'same'
+# fewer than two runs on a side: the ratio is reported but not tested
+VERDICT_UNTESTED = 'untested'
+
+def sharedKeys(base, new, by=None):
+    """Label columns identifying a config in both result sets; repetitions are pooled."""
+    keys = by or [k for k in LABELS if k != 'rep']
+    return [k for k in keys if k in base and k in new]
+
+def samples(columns, count, keys, value):
+    """dict of config key -> list of ok measurements of value."""
+    out = {}
+    vals = columns[value]
+    status = columns.get('status')
+    keyCols = [columns[k] for k in keys]
+    for i in range(count):
+        if status and status[i] not in (STATUS_OK, MISSING, ''):
+            continue
+        val = _float(vals[i])
+        if math.isnan(val):
+            continue
+        out.setdefault(tuple(str(col[i]) for col in keyCols), []).append(val)
+    return out
+
+def compareConfigs(baseSamples, newSamples, keys, alpha=0.05, threshold=0.05, higherIsBetter=False, reps=2000, seed=0):
+    """One row per config present in both sets, new relative to base.
+
+    A config is a regression or improvement when the change is at least
+    threshold (relative), the Mann-Whitney test rejects at alpha and the
+    bootstrap CI of the ratio of means excludes 1.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for key in sorted(set(baseSamples) & set(newSamples), key=_sortKey):
+        base, new = baseSamples[key], newSamples[key]
+        baseMean, newMean = mean(base), mean(new)
+        ratio = newMean / baseMean if baseMean else math.nan
+        row = dict(zip(keys, key), **{'base_n': len(base), 'new_n': len(new), 'base_mean': baseMean,
+                                      'new_mean': newMean, 'ratio': ratio})
+        if len(base) < 2 or len(new) < 2 or math.isnan(ratio):
+            row.update(p=math.nan, ci_low=math.nan, ci_high=math.nan, verdict=VERDICT_UNTESTED)
+            rows.append(row)
+            continue
+        u, p = mannWhitney(new, base)
+        low, high = bootstrapRatio(new, base, reps, rng=rng)
+        row.update(p=p, ci_low=low, ci_high=high)
+        worse = ratio < 1 if higherIsBetter else ratio > 1
+        significant = p < alpha and (low > 1 or high < 1) and abs(ratio - 1) >= threshold
+        row['verdict'] = VERDICT_SAME if not significant else VERDICT_REGRESSION if worse else VERDICT_IMPROVEMENT
+        rows.append(row)
+    return rows
+
+def summarizeApps(rows):
+    """Per app: configs compared, regressions, improvements and the geomean ratio."""
+    apps = {}
+    for row in rows:
+        apps.setdefault(row.get('app', MISSING), []).append(row)
+    out = []
+    for app in sorted(apps):
+        appRows = apps[app]
+        verdicts = [r['verdict'] for r in appRows]
+        out.append({'app': app, 'configs': len(appRows),
+                    VERDICT_REGRESSION + 's': verdicts.count(VERDICT_REGRESSION),
+                    VERDICT_IMPROVEMENT + 's': verdicts.count(VERDICT_IMPROVEMENT),
+                    VERDICT_UNTESTED: verdicts.count(VERDICT_UNTESTED),
+                    'geomean_ratio': geomean([r['ratio'] for r in appRows if not math.isnan(r['ratio'])])})
+    return out
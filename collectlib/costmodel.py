@@ -0,0 +1,184 @@
+import csv
+import time
+import threading
+
+from collectlib.extract import MISSING
+from collectlib.runner import STATUS_OK, pipedPrint
+
+# Columns tried, in order, for a row's cost: our own wall-clock first, then
+# whatever the binary reported for older result files that predate it.
+COST_COLUMNS = ('wall_s', 'wall_s_mean', 'runtime', 'runtime_mean')
+
+# Exponent used when scaling a measurement to another thread count; 1.0
+# would be perfect scaling, which graph codes never reach.
+THREAD_SCALING = 0.8
+
+def _median(vals):
+    vals = sorted(vals)
+    mid = len(vals) // 2
+    if len(vals) % 2:
+        return vals[mid]
+    return (vals[mid - 1] + vals[mid]) / 2.0
+
+def _num(val):
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+def costKey(labels):
+    """(app, graph, threads, processor) for a config's labels or a result row."""
+    graph = labels.get('graph', labels.get('graphs'))
+    threads = labels.get('threads')
+    threads = int(_num(threads)) if _num(threads) is not None else None
+    return (str(labels.get('app')), str(graph), threads, labels.get('processor') or None)
+
+def formatSeconds(secs):
+    secs = int(round(secs))
+    if secs >= 3600:
+        return "%dh%02dm" % (secs // 3600, (secs % 3600) // 60)
+    if secs >= 60:
+        return "%dm%02ds" % (secs // 60, secs % 60)
+    return "%ds" % secs
+
+class CostModel:
+    """Predicts a config's wall-clock from past result files.
+
+    Lookups fall back from the exact (app, graph, threads, processor) cell
+    to the same graph at the nearest thread count (scaled), then, when graph
+    sizes are known (see setSizes), to the app's median time per edge times
+    the graph's size, then to the app's median and finally to default.
+    """
+    def __init__(self, default=60.0):
+        self.default = default
+        self.sizes = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(v) for v in self._samples.values())
+
+    def add(self, labels, secs):
+        if secs is None or secs < 0:
+            return
+        with self._lock:
+            self._samples.setdefault(costKey(labels), []).append(secs)
+
+    def addRow(self, row):
+        # a crashed run's wall is no cost and a timed-out one's is only the limit
+        if row.get('status') not in (None, '', MISSING, STATUS_OK):
+            return
+        for col in COST_COLUMNS:
+            secs = _num(row.get(col))
+            if secs is not None:
+                self.add(row, secs)
+                return
+
+    def loadCsv(self, path):
+        with open(path, newline='') as inFile:
+            for row in csv.DictReader(inFile):
+                self.addRow(row)
+
+    @classmethod
+    def fromFiles(cls, paths, default=60.0):
+        model = cls(default)
+        for path in paths or []:
+            try:
+                model.loadCsv(path)
+            except OSError as e:
+                pipedPrint("Warning: cannot read history", path + ":", e.strerror)
+        return model
+
+    def setSizes(self, sizes):
+        """Graph display name -> size (edges, or bytes) from a GraphCatalog."""
+        self.sizes = dict(sizes)
+
+    def median(self, labels):
+        """Median of exactly comparable runs, or None without history."""
+        vals = self._samples.get(costKey(labels))
+        return _median(vals) if vals else None
+
+    def predict(self, labels):
+        app, graph, threads, processor = costKey(labels)
+        exact = self._samples.get((app, graph, threads, processor))
+        if exact:
+            return _median(exact)
+
+        if threads is not None:
+            near = [(abs(k[2] - threads), k[2], v) for k, v in self._samples.items()
+                    if k[0] == app and k[1] == graph and k[3] == processor and k[2]]
+            if near:
+                dist, other, vals = min(near, key=lambda n: n[0])
+                return _median(vals) * (float(other) / threads) ** THREAD_SCALING
+
+        size = self.sizes.get(graph)
+        if size:
+            perSize = [s / self.sizes[k[1]] for k, v in self._samples.items()
+                       if k[0] == app and k[3] == processor and k[2] == threads and self.sizes.get(k[1]) for s in v]
+            if perSize:
+                return _median(perSize) * size
+
+        same = [s for k, v in self._samples.items() if k[0] == app and k[3] == processor for s in v]
+        if same:
+            return _median(same)
+        return self.default
+
+    def estimate(self, labelsList, jobs=1):
+        """Prints the predicted wall-clock of a set of configs, in total and per app."""
+        perApp = {}
+        count = 0
+        for labels in labelsList:
+            app = str(labels.get('app'))
+            perApp[app] = perApp.get(app, 0.0) + self.predict(labels)
+            count += 1
+        total = sum(perApp.values())
+        pipedPrint("Estimate: %d configs, %s of runs, ~%s wall with %d job(s) (history: %d runs)" % (count, formatSeconds(total), formatSeconds(total / max(1, jobs)), jobs, len(self)))
+        for app, secs in perApp.items():
+            pipedPrint("\t%s: %s" % (app, formatSeconds(secs)))
+        return total
+
+class TimeoutPolicy:
+    """Per-config timeout of factor times the median of comparable past runs,
+    clamped to [floor, ceiling]; configs without history get ceiling (None
+    for no limit). idle is the inactivity limit handed to the runner."""
+    def __init__(self, model=None, factor=5.0, floor=60.0, ceiling=None, idle=None):
+        self.model = model
+        self.factor = factor
+        self.floor = floor
+        self.ceiling = ceiling
+        self.idle = idle
+
+    def timeout(self, labels):
+        median = self.model.median(labels) if self.model else None
+        if median is None:
+            return self.ceiling
+        secs = max(self.floor, self.factor * median)
+        return min(secs, self.ceiling) if self.ceiling else secs
+
+class Progress:
+    """Live ETA: the remaining predicted time, rescaled by how far off the
+    predictions were for the runs that have finished so far."""
+    def __init__(self, model, total, count, jobs=1, quiet=False):
+        self.model = model
+        self.remaining = total
+        self.left = count
+        self.jobs = max(1, jobs)
+        self.quiet = quiet
+        self.predictedDone = 0.0
+        self.actualDone = 0.0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def done(self, labels, wall):
+        with self._lock:
+            predicted = self.model.predict(labels)
+            self.remaining = max(0.0, self.remaining - predicted)
+            self.left -= 1
+            if wall is not None:
+                self.predictedDone += predicted
+                self.actualDone += wall
+            scale = self.actualDone / self.predictedDone if self.predictedDone > 0 else 1.0
+            eta = self.remaining * scale / self.jobs
+            if not self.quiet:
+                pipedPrint("\tETA: %d left, elapsed %s, ~%s remaining" % (self.left, formatSeconds(time.monotonic() - self.start), formatSeconds(eta)))
+            return eta
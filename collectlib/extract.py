@@ -0,0 +1,216 @@
+import re
+
+AGG_FIRST = 'first'
+AGG_LAST = 'last'
+AGG_SUM = 'sum'
+AGG_ALL = 'all'
+
+MISSING = '---'
+
+def toNumber(val):
+    try:
+        return int(val)
+    except ValueError:
+        return float(val)
+
+TYPES = {
+    'number': toNumber,
+    'int': int,
+    'float': float,
+    'str': str,
+}
+
+class Metric:
+    """One value a collector wants out of a run's output.
+
+    name is the key as printed by the binary ("Running time", "VTX_CLs"),
+    column the result column it is stored under. In whitespace mode (an
+    Extractor with sep=None) field is the index of the value token, so
+    field=2 matches awk's $3.
+    """
+    def __init__(self, name, column=None, type='number', unit=None, agg=AGG_FIRST, field=None):
+        if type not in TYPES:
+            raise ValueError("Unknown metric type: " + str(type))
+        if agg not in (AGG_FIRST, AGG_LAST, AGG_SUM, AGG_ALL):
+            raise ValueError("Unknown aggregation: " + str(agg))
+        self.name = name
+        self.column = column or name
+        self.type = type
+        self.unit = unit
+        self.agg = agg
+        self.field = field
+
+    @classmethod
+    def parse(cls, spec):
+        """Builds a Metric from "name[:type[:agg[:column]]]"."""
+        parts = spec.split(':')
+        name = parts[0]
+        type = parts[1] if len(parts) > 1 and parts[1] else 'number'
+        agg = parts[2] if len(parts) > 2 and parts[2] else AGG_FIRST
+        column = parts[3] if len(parts) > 3 and parts[3] else None
+        return cls(name, column, type, agg=agg)
+
+class Extractor:
+    """Compiles a set of Metrics into one single-pass line matcher.
+
+    All metric names are folded into one line-anchored regex alternation,
+    so a block of output is scanned once in C and only matching lines reach
+    Python, where the key is resolved with a dict lookup. Lines are split
+    on sep, or on whitespace when sep is None. Malformed lines and
+    unconvertible values never raise: the former are skipped, the latter
+    kept as stripped strings. With captureAll every key/value line is
+    recorded (last value wins), which needs a per-line pass instead.
+    """
+    def __init__(self, metrics, sep=':', captureAll=False, captureType='float'):
+        self.metrics = list(metrics)
+        self.sep = sep
+        self.captureAll = captureAll
+        self.captureType = captureType
+        self.captureConv = TYPES[captureType]
+        self._lookup = {}
+        for i, metric in enumerate(self.metrics):
+            self._lookup.setdefault(metric.name, []).append(i)
+        self._convs = [TYPES[m.type] for m in self.metrics]
+        names = '|'.join(re.escape(n) for n in sorted(self._lookup, key=len, reverse=True))
+        # Leading with a literal newline lets re skip ahead with a fast scan
+        # instead of trying the pattern at every offset, so feedText()
+        # prepends one to each block.
+        if sep is None:
+            self._regex = re.compile(r'\n[ \t]*(' + names + r')(?![^ \t\n])([^\n]*)')
+        else:
+            self._regex = re.compile(r'\n[ \t]*(' + names + r')[ \t]*' + re.escape(sep) + r'([^\n]*)')
+        self._fields = [m.field if m.field is not None else 1 for m in self.metrics]
+        # Only first-value metrics can be complete before the output ends
+        self.canStop = bool(self.metrics) and not captureAll and all(m.agg == AGG_FIRST for m in self.metrics)
+
+    def columns(self):
+        return [m.column for m in self.metrics]
+
+    def units(self):
+        return dict((m.column, m.unit) for m in self.metrics if m.unit)
+
+    def newParser(self):
+        return ExtractParser(self)
+
+    def signature(self):
+        """Everything that determines what this extractor returns, as a string."""
+        metrics = [(m.name, m.column, m.type, m.agg, m.field) for m in self.metrics]
+        return repr((metrics, self.sep, self.captureAll, self.captureConv.__name__))
+
+    def toDict(self):
+        """The extractor as plain data for fromDict, e.g. to keep with archived output."""
+        return {"metrics": [[m.name, m.column, m.type, m.unit, m.agg, m.field] for m in self.metrics],
+                "sep": self.sep, "captureAll": self.captureAll, "captureType": self.captureType}
+
+    @classmethod
+    def fromDict(cls, spec):
+        metrics = [Metric(name, column, type, unit, agg, field) for name, column, type, unit, agg, field in spec["metrics"]]
+        return cls(metrics, spec["sep"], spec["captureAll"], spec["captureType"])
+
+    def extractLines(self, lines):
+        return self.extractText('\n'.join(lines))
+
+    def extractText(self, text):
+        parser = self.newParser()
+        parser.feedText(text)
+        return parser.result()
+
+class ExtractParser:
+    def __init__(self, extractor):
+        self.ex = extractor
+        self.values = [None] * len(extractor.metrics)
+        self.captured = {}
+        self.remaining = len(extractor.metrics)
+
+    def feed(self, line):
+        return self.feedText(line)
+
+    def feedText(self, text):
+        """Parses a block of complete lines; True once every metric is final."""
+        ex = self.ex
+        if ex.captureAll:
+            return self._feedAll(text)
+        if not ex.metrics:
+            return False
+        for match in ex._regex.finditer('\n' + text):
+            key, value = match.group(1), match.group(2)
+            if ex.sep is None:
+                value = [key] + value.split()
+            if self._apply(ex._lookup[key], value):
+                return True
+        return False
+
+    def _feedAll(self, text):
+        ex = self.ex
+        sep = ex.sep
+        lookup = ex._lookup
+        conv = ex.captureConv
+        captured = self.captured
+        for line in text.split('\n'):
+            key, found, value = line.partition(sep)
+            if not found:
+                continue
+            key = key.strip()
+            slots = lookup.get(key)
+            if slots is None:
+                value = value.strip()
+                try:
+                    captured[key] = conv(value)
+                except ValueError:
+                    captured[key] = value
+            else:
+                self._apply(slots, value)
+        return False
+
+    def _apply(self, slots, value):
+        ex = self.ex
+        for i in slots:
+            metric = ex.metrics[i]
+            if ex.sep is None:
+                field = ex._fields[i]
+                if field >= len(value):
+                    continue
+                raw = value[field]
+            else:
+                raw = value.strip()
+            try:
+                val = ex._convs[i](raw)
+            except ValueError:
+                if metric.agg == AGG_SUM:
+                    continue
+                val = raw
+
+            agg = metric.agg
+            if agg == AGG_FIRST:
+                if self.values[i] is None:
+                    self.values[i] = val
+                    self.remaining -= 1
+            elif agg == AGG_LAST:
+                self.values[i] = val
+            elif agg == AGG_SUM:
+                self.values[i] = val if self.values[i] is None else self.values[i] + val
+            else:
+                if self.values[i] is None:
+                    self.values[i] = []
+                self.values[i].append(val)
+
+        return ex.canStop and self.remaining == 0
+
+    def result(self):
+        data = dict(self.captured)
+        for metric, val in zip(self.ex.metrics, self.values):
+            if val is None:
+                val = MISSING
+            elif metric.agg == AGG_ALL:
+                val = ';'.join(str(v) for v in val)
+            data[metric.column] = val
+        return data
+
+EXTRACTORS = {}
+
+def registerExtractor(name, extractor):
+    EXTRACTORS[name] = extractor
+    return extractor
+
+def getExtractor(name):
+    return EXTRACTORS[name]
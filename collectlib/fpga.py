@@ -0,0 +1,162 @@
+import time
+import threading
+import subprocess
+
+from collectlib.runner import STATUS_ERROR, STATUS_OK, STATUS_TIMEOUT, pipedPrint
+
+class BitstreamScheduler:
+    """Runs RunCollect work grouped by bitstream.
+
+    Each bitstream is programmed once and all FPGA configs that need it run
+    back to back. CPU configs do not need the FPGA, so with overlap they run
+    on a host thread while the FPGA is busy or being reprogrammed; without
+    it each bitstream's runs go in their original order. The RunCollects
+    only need pendingRuns() and configs that carry an fpga flag.
+
+    fpgaconf is run as given, also in test mode, so a stand-in script can
+    take its place; its output is echoed and, with log, appended to that
+    file.
+    """
+    def __init__(self, fpgaconf="fpgaconf", overlap=False, timeout=300, quiet=False, log=None):
+        self.fpgaconf = fpgaconf
+        self.log = log
+        self.overlap = overlap
+        self.timeout = timeout
+        self.quiet = quiet
+        self._groups = {}
+        self.reconfigs = []
+        self.fpgaBusy = 0.0
+        self.cpuBusy = 0.0
+        self.makespan = 0.0
+
+    def add(self, runCollect, bitstream):
+        self._groups.setdefault(bitstream, []).append(runCollect)
+
+    def program(self, bitstream):
+        cmd = [self.fpgaconf, bitstream]
+        if not self.quiet:
+            pipedPrint("Executing:", ' '.join(cmd))
+        start = time.monotonic()
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, timeout=self.timeout)
+            status = STATUS_OK if proc.returncode == 0 else STATUS_ERROR
+            out = proc.stdout
+        except subprocess.TimeoutExpired as e:
+            status = STATUS_TIMEOUT
+            out = e.stdout or b''
+        except OSError as e:
+            status = STATUS_ERROR
+            out = (str(e) + '\n').encode()
+        secs = time.monotonic() - start
+        self._log(cmd, status, out.decode(errors='replace'))
+        self.reconfigs.append((bitstream, secs, status == STATUS_OK))
+        if status != STATUS_OK:
+            pipedPrint("Warning: programming", bitstream, "failed (" + status + "), skipping its FPGA runs")
+        return status == STATUS_OK
+
+    def _log(self, cmd, status, text):
+        if not self.quiet:
+            for line in text.splitlines():
+                pipedPrint("\t" + line)
+        if self.log:
+            with open(self.log, 'a') as logFile:
+                logFile.write("%s %s [%s]\n%s" % (time.strftime("%Y-%m-%d %H:%M:%S"), ' '.join(cmd), status, text))
+
+    def _skip(self, skipJob, jobs):
+        for runCollect, graph, config in jobs:
+            skipJob(runCollect, graph, config)
+
+    def _timed(self, runJob, jobs):
+        busy = 0.0
+        for runCollect, graph, config in jobs:
+            start = time.monotonic()
+            runJob(runCollect, graph, config)
+            busy += time.monotonic() - start
+        return busy
+
+    def run(self, runJob, runGroup=None, skipJob=None):
+        """Calls runJob(runCollect, graph, config) for every pending run, or
+        skipJob with the same arguments for an FPGA run whose bitstream
+        failed to program. Those are called last, so the first rows written
+        come from runs that were made.
+
+        Without overlap, runGroup(runCollect, graph, configs) may be given to
+        take all pending configs of a graph at once (e.g. to interleave
+        their repetitions); its time counts as FPGA busy when any of them
+        is an FPGA config.
+        """
+        start = time.monotonic()
+        skipped = []
+        if not self.overlap:
+            for bitstream, runCollects in self._groups.items():
+                jobs = [(rc, graph, config) for rc in runCollects for graph, config in rc.pendingRuns()]
+                if jobs and not self.program(bitstream):
+                    skipped += [job for job in jobs if job[2].fpga]
+                    jobs = [job for job in jobs if not job[2].fpga]
+                if runGroup:
+                    self._runGroups(runGroup, jobs)
+                    continue
+                for job in jobs:
+                    busy = self._timed(runJob, [job])
+                    if job[2].fpga:
+                        self.fpgaBusy += busy
+                    else:
+                        self.cpuBusy += busy
+            self.makespan = time.monotonic() - start
+            if skipJob:
+                self._skip(skipJob, skipped)
+            return
+
+        fpgaJobs = {}
+        cpuJobs = []
+        for bitstream, runCollects in self._groups.items():
+            for rc in runCollects:
+                for graph, config in rc.pendingRuns():
+                    if config.fpga:
+                        fpgaJobs.setdefault(bitstream, []).append((rc, graph, config))
+                    else:
+                        cpuJobs.append((rc, graph, config))
+
+        errors = []
+        def cpuWorker():
+            try:
+                self.cpuBusy += self._timed(runJob, cpuJobs)
+            except BaseException as e:
+                errors.append(e)
+
+        cpuThread = threading.Thread(target=cpuWorker, name="cpu-runs")
+        cpuThread.start()
+        try:
+            for bitstream, jobs in fpgaJobs.items():
+                if self.program(bitstream):
+                    self.fpgaBusy += self._timed(runJob, jobs)
+                else:
+                    skipped += jobs
+        finally:
+            cpuThread.join()
+        self.makespan = time.monotonic() - start
+        if errors:
+            raise errors[0]
+        if skipJob:
+            self._skip(skipJob, skipped)
+
+    def _runGroups(self, runGroup, jobs):
+        groups = {}
+        for rc, graph, config in jobs:
+            groups.setdefault((id(rc), graph), (rc, graph, []))[2].append(config)
+        for rc, graph, configs in groups.values():
+            begin = time.monotonic()
+            runGroup(rc, graph, configs)
+            busy = time.monotonic() - begin
+            if any(config.fpga for config in configs):
+                self.fpgaBusy += busy
+            else:
+                self.cpuBusy += busy
+
+    def report(self):
+        reconfigTime = sum(r[1] for r in self.reconfigs)
+        fpgaIdle = max(0.0, self.makespan - reconfigTime - self.fpgaBusy)
+        pipedPrint("Scheduler: %d reconfiguration(s) taking %.1fs" % (len(self.reconfigs), reconfigTime))
+        for bitstream, secs, ok in self.reconfigs:
+            pipedPrint("\t%s %.1fs%s" % (bitstream, secs, "" if ok else " FAILED"))
+        pipedPrint("Scheduler: wall %.1fs, FPGA busy %.1fs, FPGA idle %.1fs, CPU busy %.1fs" % (self.makespan, self.fpgaBusy, fpgaIdle, self.cpuBusy))
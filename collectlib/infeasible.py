@@ -0,0 +1,126 @@
+import re
+import threading
+
+from collectlib.extract import MISSING
+from collectlib.runner import STATUS_INFEASIBLE, STATUS_STALLED, STATUS_TIMEOUT, USAGE_COLUMNS, RunResult
+from collectlib.shard import CELL
+
+# Statuses that say a config is too hard. An error (a crash, a bad option,
+# a missing file) says nothing about the configs around it, so it does
+# not prune them.
+FAILED = (STATUS_TIMEOUT, STATUS_STALLED)
+
+def _num(val):
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+def _rmat(val):
+    # S25-E16 -> (25, 16)
+    match = re.match(r'^[sS](\d+)[-_][eE](\d+)', str(val))
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+def fewerIsHarder(val):
+    num = _num(val)
+    return None if num is None else (-num,)
+
+def moreIsHarder(val):
+    num = _num(val)
+    return None if num is None else (num,)
+
+def rmatHardness(val):
+    return _rmat(val)
+
+# Axis -> hardness of a label value: a tuple that is at least as large in
+# every position for a config at least as hard, or None if the value has
+# no place in the order (e.g. a real-world graph), which then only
+# dominates itself.
+MONOTONIC = {
+    'threads': fewerIsHarder,
+    'graphs': rmatHardness,
+    'graph': rmatHardness,
+    'scale': moreIsHarder,
+}
+
+def _atLeast(a, b):
+    return len(a) == len(b) and all(x >= y for x, y in zip(a, b))
+
+class InfeasiblePruner:
+    """Skips configs that are at least as hard as one that already failed.
+
+    If Twitter at -w 4 timed out, -w 2 and -w 1 will too; so will S25-E32
+    where S23-E32 or S25-E8 did. A failed config dominates another when
+    the other is at least as hard on every monotonic axis (graph scale and
+    edge factor count separately) and has the same value for every other
+    label except those in ignore (and the shard cell). axes is a subset of
+    MONOTONIC (default all of it); a config fails with one of statuses.
+    """
+    def __init__(self, axes=None, ignore=(), statuses=FAILED):
+        unknown = [a for a in axes or () if a not in MONOTONIC]
+        if unknown:
+            raise ValueError("Not a monotonic axis: %s (known: %s)" % (', '.join(unknown), ', '.join(MONOTONIC)))
+        self.axes = dict((a, MONOTONIC[a]) for a in axes) if axes is not None else dict(MONOTONIC)
+        # the shard cell number is unique per config, never a difference that matters
+        self.ignore = set(ignore) | {CELL}
+        self.statuses = set(statuses)
+        self.failed = []
+        self.pruned = 0
+        self._lock = threading.Lock()
+
+    def _hardness(self, key, val):
+        h = self.axes[key](val)
+        return h if h is not None else ('=', str(val))
+
+    def _dominates(self, failed, labels):
+        if set(failed) - self.ignore != set(labels) - self.ignore:
+            return False
+        for key, val in labels.items():
+            if key in self.ignore:
+                continue
+            if key in self.axes:
+                a, b = self._hardness(key, val), self._hardness(key, failed[key])
+                if a[0] == '=' or b[0] == '=':
+                    if a != b:
+                        return False
+                elif not _atLeast(a, b):
+                    return False
+            elif str(val) != str(failed[key]):
+                return False
+        return True
+
+    def record(self, labels, status):
+        if status in self.statuses:
+            with self._lock:
+                self.failed.append(dict(labels))
+
+    def dominatedBy(self, labels):
+        """The failed config's labels that make labels infeasible, or None."""
+        with self._lock:
+            failed = list(self.failed)
+        for f in failed:
+            if self._dominates(f, labels):
+                return f
+        return None
+
+    def rank(self, labels):
+        """Sort key putting easier configs first, so that a failure prunes
+        as much of the rest as possible (a linear extension of dominance)."""
+        key = []
+        for axis in self.axes:
+            if axis in labels:
+                h = self.axes[axis](labels[axis])
+                key.append(h if h is not None else ())
+        return key
+
+    def result(self, extractor, perf=None):
+        """The RunResult recorded for a skipped config: status infeasible and
+        the same (empty) columns as a run that produced nothing."""
+        with self._lock:
+            self.pruned += 1
+        usage = dict((c, MISSING) for c in USAGE_COLUMNS)
+        return RunResult(STATUS_INFEASIBLE, extractor.newParser().result(), usage=usage,
+                         counters=perf.collect(None) if perf else None)
+
+def describe(labels):
+    return ' '.join("%s=%s" % kv for kv in labels.items())
@@ -0,0 +1,107 @@
+import os
+import shutil
+
+from collectlib.extract import MISSING
+from collectlib.runner import pipedPrint
+
+NUMACTL = "numactl"
+
+ORDER_DEFAULT = 'default'
+ORDER_INTERLEAVE = 'interleave'
+ORDER_RANDOM = 'random'
+ORDERS = (ORDER_DEFAULT, ORDER_INTERLEAVE, ORDER_RANDOM)
+
+def parseCpuList(spec):
+    """"0-3,8,10-11" (the kernel's cpulist format) -> set of cpu numbers."""
+    cpus = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        try:
+            first = int(first)
+            last = int(last) if sep else first
+        except ValueError:
+            raise ValueError("Bad cpu list: " + spec)
+        if last < first:
+            raise ValueError("Bad cpu range: " + part)
+        cpus.update(range(first, last + 1))
+    return cpus
+
+def formatCpuList(cpus):
+    cpus = sorted(cpus)
+    parts = []
+    i = 0
+    while i < len(cpus):
+        j = i
+        while j + 1 < len(cpus) and cpus[j + 1] == cpus[j] + 1:
+            j += 1
+        parts.append(str(cpus[i]) if i == j else "%d-%d" % (cpus[i], cpus[j]))
+        i = j + 1
+    return ','.join(parts)
+
+def nodeCpus(node):
+    """Cpus of a NUMA node, or None if the kernel does not expose it."""
+    try:
+        with open("/sys/devices/system/node/node%d/cpulist" % node) as inFile:
+            return parseCpuList(inFile.read())
+    except OSError:
+        return None
+
+def pinnedCpus(cpuSpec=None, numaNode=None):
+    """The cpus runs should be pinned to: --cpus, else the NUMA node's cpus,
+    limited to what this process may use. None means no pinning."""
+    allowed = os.sched_getaffinity(0)
+    if cpuSpec:
+        cpus = parseCpuList(cpuSpec)
+    elif numaNode is not None:
+        cpus = nodeCpus(numaNode)
+        if cpus is None:
+            pipedPrint("Warning: NUMA node", numaNode, "not found, runs are not pinned to it")
+            return None
+    else:
+        return None
+    usable = cpus & allowed
+    if not usable:
+        raise ValueError("None of cpus " + formatCpuList(cpus) + " are available to this process")
+    if usable != cpus:
+        pipedPrint("Warning: cpus", formatCpuList(cpus - allowed), "are not available, pinning to", formatCpuList(usable))
+    return usable
+
+class NumaBind:
+    """Binds a run's memory to one NUMA node by prefixing numactl --membind.
+
+    Without numactl (or without that node) a warning is printed once and
+    runs are left unbound, which the recorded numa_node column shows.
+    """
+    def __init__(self, node, numactl=NUMACTL):
+        self.node = node
+        self.numactl = numactl
+        self.active = True
+        if not shutil.which(numactl):
+            pipedPrint("Warning: " + numactl + " not found, memory is not bound to node", node)
+            self.active = False
+        elif not os.path.exists("/sys/devices/system/node/node%d" % node):
+            pipedPrint("Warning: NUMA node", node, "not found, memory is not bound")
+            self.active = False
+
+    def wrap(self, cmd):
+        if not self.active:
+            return cmd
+        return [self.numactl, "--membind=%d" % self.node, "--"] + list(cmd)
+
+# Column with the cores runs were pinned to; runPlan puts each run's own
+# subset there in place of the whole set
+PINNED = 'pinned'
+
+def noiseSettings(cpus=None, membind=None, warmups=0, order=None):
+    """Columns recording how runs were isolated, added to every row."""
+    settings = {
+        PINNED: formatCpuList(cpus) if cpus else MISSING,
+        "numa_node": membind.node if membind and membind.active else MISSING,
+        "warmups": warmups,
+    }
+    if order:
+        settings["order"] = order
+    return settings
@@ -0,0 +1,145 @@
+import sys
+
+from collectlib.archive import COMPRESSIONS, OutputArchive
+from collectlib.cache import ResultCache
+from collectlib.costmodel import CostModel, Progress, TimeoutPolicy
+from collectlib.infeasible import MONOTONIC, InfeasiblePruner
+from collectlib.noise import NumaBind, noiseSettings, pinnedCpus
+from collectlib.perf import PerfStat
+from collectlib.plan import parseFilters, printPlan
+from collectlib.prefetch import GraphPrefetcher
+from collectlib.resume import ResumeIndex
+from collectlib.runner import Runner, pipedPrint
+from collectlib.shard import shardPlans
+from collectlib.spec import trimToBudget
+from collectlib.store import DURABILITY, DURABILITY_BATCH, ColumnStore, TeeWriter
+from collectlib.sweep import RUN_ERR_CONTINUE, RUN_ERR_RETRY, runPlan, threadsFromCmd
+from collectlib.writer import CSVWriter
+
+def addArguments(parser, threadFlag='-w'):
+    """Adds the options every plan-based collector shares (see SweepOptions);
+    threadFlag is how its binaries take their thread count."""
+    parser.add_argument('--jobs', action="store", type=int, default=1, dest="jobs", help="Run up to N configs at once, each pinned to its own set of cores sized by its " + threadFlag + " thread count")
+    parser.add_argument('--graph-locality', action="store_true", default=False, dest="graph_locality", help="Run all configs of one graph together and prefetch the next graph file into the page cache in the background")
+    parser.add_argument('--history', action="store", nargs='+', default=None, dest="history", help="Past result CSVs used to predict run times, print an estimate before launch and a live ETA (with --jobs, the longest predicted configs are dispatched first)")
+    parser.add_argument('--dry-run', action="store_true", default=False, dest="dry_run", help="List the configs that would run (index, command, labels) and exit")
+    parser.add_argument('--filter', action="append", default=None, dest="filter", help="Only run configs whose label matches, e.g. --filter threads=4 --filter graphs=S23-E8,S25-E8")
+    parser.add_argument('--shard', action="store", default=None, dest="shard", help="Only run shard i of N (i/N, 0-based) of the config space; with --history shards are balanced by predicted time, so give every node the same history. Rows get a cell column for 'results.py merge'")
+    parser.add_argument('--timeout', action="store", type=float, default=None, dest="timeout", help="Seconds after which a run is killed (its whole process group) and recorded with status timeout; with --history this is the ceiling of the per-config timeout")
+    parser.add_argument('--timeout-factor', action="store", type=float, default=5.0, dest="timeout_factor", help="With --history, a config's timeout is this many times the median wall-clock of comparable past runs (at least 60s)")
+    parser.add_argument('--idle-timeout', action="store", type=float, default=None, dest="idle_timeout", help="Kill a run that prints nothing for this many seconds and record it with status stalled")
+    parser.add_argument('--retries', action="store", type=int, default=0, dest="retries", help="Retry a failed, timed-out or stalled run up to N times with exponential backoff")
+    parser.add_argument('--perf-events', action="store", default=None, dest="perf_events", help="Wrap every run in 'perf stat' and add a column per event, e.g. cycles,instructions,LLC-loads,LLC-load-misses (ipc and llc_miss_rate are derived when both inputs are given); events perf cannot count are left empty")
+    parser.add_argument('--cpus', action="store", default=None, dest="cpus", help="Pin runs to these cores (cpulist format, e.g. 0-15,32-47); with --jobs each run gets its own subset")
+    parser.add_argument('--numa-node', action="store", type=int, default=None, dest="numa_node", help="Bind run memory to this NUMA node with numactl (and pin to its cores unless --cpus is given)")
+    parser.add_argument('--warmups', action="store", type=int, default=0, dest="warmups", help="Discarded warm-up runs before the first run of each (app, graph)")
+    parser.add_argument('--cache', action="store", default=None, dest="cache", help="Result cache directory: runs whose executable, graph file, bitstream and arguments are unchanged are not executed again; a cached column marks their rows with 1")
+    parser.add_argument('--cache-refresh', action="store_true", default=False, dest="cache_refresh", help="Ignore cached results (but store the new ones)")
+    parser.add_argument('--cache-max-age', action="store", type=float, default=None, dest="cache_max_age", help="After the sweep, drop cache entries older than this many days")
+    parser.add_argument('--cache-max-mb', action="store", type=float, default=None, dest="cache_max_mb", help="After the sweep, drop the oldest cache entries until the cache fits in this many MB")
+    parser.add_argument('--store', action="store", default=None, dest="store", help="Also append results to this columnar store directory (typed segments, see 'results.py export')")
+    parser.add_argument('--store-durability', action="store", choices=DURABILITY, default=DURABILITY_BATCH, dest="store_durability", help="When store segments are written: on exit, every batch of rows (default) or every batch plus fsync")
+    parser.add_argument('--catalog', action="store", default=None, dest="catalog", help="Graph catalog index file (created if missing): graphs are looked up by name under the graph directory, and with --history their sizes let the cost model predict graphs that have no history")
+    parser.add_argument('--size-class', action="store", default=None, dest="size_class", help="With --catalog, only run graphs of these size classes (comma-separated: small up to 1 GB, medium up to 8 GB, large)")
+    parser.add_argument('--spec', action="store", default=None, dest="spec", help="Sweep spec file (.json or .toml) whose sweeps replace the built-in ones and the app flags; see specs/")
+    parser.add_argument('--budget-hours', action="store", type=float, default=None, dest="budget_hours", help="With --history, drop the longest predicted configs until the sweep fits in this many hours (overrides the spec's budget_hours)")
+    parser.add_argument('--prune-infeasible', action="store_true", default=False, dest="prune_infeasible", help="Run easier configs first (more threads, smaller RMAT scale and edge factor) and skip, recording status infeasible, any config at least as hard as one that timed out or stalled; errors do not prune")
+    parser.add_argument('--prune-axes', action="store", default=None, dest="prune_axes", help="Comma-separated labels along which --prune-infeasible compares hardness (default and choices: " + ','.join(MONOTONIC) + "); other labels must match exactly")
+    parser.add_argument('--prune-ignore', action="store", default=None, dest="prune_ignore", help="Comma-separated labels that do not matter for --prune-infeasible, e.g. start_vtx to let one vertex's timeout prune the others")
+    parser.add_argument('--archive', action="store", default=None, dest="archive", help="Keep every run's stdout and stderr, compressed, in this directory and add a run_id column, so 'results.py reextract' can pull new metrics out of them later")
+    parser.add_argument('--archive-compression', action="store", choices=sorted(COMPRESSIONS), default="lzma", dest="archive_compression", help="How archived output is compressed: lzma (default, smaller) or zlib (faster)")
+    parser.add_argument('--resume', action="store_true", default=False, dest="resume", help="Append to outfile and only run configs that have no ok row in it yet (failed ones run again)")
+
+class SweepOptions:
+    """The options of addArguments turned into what runPlan takes.
+
+    cli also needs out_file, test and append; bad values are reported
+    through parser. In test mode every run executes testCmd instead.
+    coresFn sizes each run's cores with --jobs and --cpus; with a catalog
+    the cost model also predicts graphs that have no history, from their
+    sizes in the given formats.
+    """
+    def __init__(self, cli, parser, testCmd, coresFn=threadsFromCmd, catalog=None, formats=None):
+        self.cli = cli
+        self.parser = parser
+        perfStat = PerfStat(cli.perf_events.split(',')) if cli.perf_events else None
+        membind = NumaBind(cli.numa_node) if cli.numa_node is not None else None
+        try:
+            pinned = pinnedCpus(cli.cpus, cli.numa_node)
+        except ValueError as e:
+            parser.error(str(e))
+        self.runner = Runner(testCmd if cli.test else None, perfStat, membind)
+        self.resume = ResumeIndex(cli.out_file) if cli.resume else None
+        self.writer = CSVWriter(cli.out_file, cli.append or cli.resume)
+        if cli.store:
+            self.writer = TeeWriter(self.writer, ColumnStore(cli.store).writer(durability=cli.store_durability))
+        self.prefetcher = GraphPrefetcher() if cli.graph_locality else None
+        self.costModel = CostModel.fromFiles(cli.history) if cli.history else None
+        if self.costModel and catalog:
+            self.costModel.setSizes(catalog.sizes(formats))
+        self.cache = ResultCache(cli.cache, cli.cache_refresh) if cli.cache else None
+        self.archive = OutputArchive(cli.archive, cli.archive_compression) if cli.archive else None
+        pruner = None
+        if cli.prune_infeasible:
+            try:
+                pruner = InfeasiblePruner(cli.prune_axes.split(',') if cli.prune_axes else None, cli.prune_ignore.split(',') if cli.prune_ignore else ())
+            except ValueError as e:
+                parser.error(str(e))
+        self.planOpts = dict(runner=self.runner, jobs=cli.jobs, coresFn=coresFn, resume=self.resume, groupBy='graphs' if cli.graph_locality else None,
+                             prefetcher=self.prefetcher, cpus=pinned, warmups=cli.warmups, settings=noiseSettings(pinned, membind, cli.warmups),
+                             timeoutPolicy=TimeoutPolicy(self.costModel, cli.timeout_factor, ceiling=cli.timeout, idle=cli.idle_timeout),
+                             costModel=self.costModel, cache=self.cache, pruner=pruner, archive=self.archive, retries=cli.retries,
+                             errorBehavior=RUN_ERR_RETRY if cli.retries else RUN_ERR_CONTINUE)
+
+    def select(self, plans, spec=None):
+        """plans narrowed by --filter, --budget-hours (or the spec's budget_hours) and --shard."""
+        cli = self.cli
+        if cli.filter:
+            try:
+                pred = parseFilters(cli.filter)
+            except ValueError as e:
+                self.parser.error(str(e))
+            plans = [plan.filter(pred) for plan in plans]
+
+        budgetHours = cli.budget_hours or (spec or {}).get("budget_hours")
+        if budgetHours:
+            if self.costModel:
+                plans = trimToBudget(plans, self.costModel, budgetHours * 3600, cli.jobs)
+            else:
+                pipedPrint("Warning: a budget needs --history to predict run times; ignoring it")
+
+        if cli.shard:
+            try:
+                plans = shardPlans(plans, cli.shard, self.costModel)
+            except ValueError as e:
+                self.parser.error(str(e))
+        return plans
+
+    def run(self, plans, extractor):
+        """Runs the plans (or with --dry-run lists them and exits), then
+        closes the output and reports on prefetching, archive and cache."""
+        cli = self.cli
+        if cli.dry_run:
+            count = 0
+            for plan in plans:
+                count += printPlan(plan)
+            pipedPrint("Total:", count, "configs")
+            sys.exit(0)
+
+        progress = None
+        if self.costModel:
+            pending = [confDict for plan in plans for cmd, confDict in plan if not (self.resume and self.resume.isDone(confDict))]
+            progress = Progress(self.costModel, self.costModel.estimate(pending, cli.jobs), len(pending), cli.jobs)
+
+        for plan in plans:
+            runPlan(plan, extractor, self.writer, **self.planOpts, progress=progress)
+
+        self.writer.close()
+
+        if self.prefetcher:
+            self.prefetcher.report()
+        if self.archive:
+            self.archive.report()
+        if self.cache:
+            self.cache.evict(cli.cache_max_age * 86400 if cli.cache_max_age else None, cli.cache_max_mb * 1e6 if cli.cache_max_mb else None)
+            self.cache.report()
@@ -0,0 +1,123 @@
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+
+from collectlib.extract import MISSING, toNumber
+from collectlib.runner import pipedPrint
+
+PERF = "perf"
+
+# Derived columns: (column, numerator event, denominator event)
+DERIVED = [
+    ("ipc", "instructions", "cycles"),
+    ("llc_miss_rate", "LLC-load-misses", "LLC-loads"),
+    ("cache_miss_rate", "cache-misses", "cache-references"),
+    ("branch_miss_rate", "branch-misses", "branches"),
+]
+
+def _baseEvent(name):
+    # perf may echo an event back with modifiers it added itself (cycles:u)
+    return name.split(':')[0]
+
+def perfColumn(event):
+    return "perf_" + re.sub(r'[^0-9A-Za-z]+', '_', event).strip('_')
+
+def parsePerfCsv(text, events):
+    """Counter values of `perf stat -x,` output by requested event name.
+
+    Lines are value,unit,event,...; uncounted or unsupported events and
+    anything unparsable are left out.
+    """
+    wanted = dict((_baseEvent(e), e) for e in events)
+    counts = {}
+    for line in text.split('\n'):
+        if not line or line.startswith('#'):
+            continue
+        fields = line.split(',')
+        if len(fields) < 3:
+            continue
+        event = wanted.get(_baseEvent(fields[2]))
+        if event is None:
+            continue
+        try:
+            counts[event] = toNumber(fields[0])
+        except ValueError:
+            pass
+    return counts
+
+class PerfStat:
+    """Wraps run commands in `perf stat -x,` and turns its output into columns.
+
+    Events perf does not know or may not count here are dropped with a
+    warning when the wrapper is created; without perf nothing is wrapped.
+    Either way every requested event (and each derived ratio whose inputs
+    were requested) gets a column, MISSING when it was not measured, so
+    result headers do not depend on the host.
+    """
+    def __init__(self, events, perf=PERF):
+        self.events = [e.strip() for e in events if e.strip()]
+        self.perf = perf
+        self.derived = [d for d in DERIVED if d[1] in self.events and d[2] in self.events]
+        self.active = self._probe()
+
+    def _probe(self):
+        if not shutil.which(self.perf):
+            pipedPrint("Warning: " + self.perf + " not found, hardware counters will not be collected")
+            return []
+        try:
+            out = subprocess.run([self.perf, "stat", "-x,", "-e", ','.join(self.events), "--", "true"],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            out = None
+        if out is None or out.returncode != 0:
+            # typically an unknown event name or perf_event_paranoid; try events one by one
+            active = [e for e in self.events if self._probeOne(e)]
+        else:
+            counted = parsePerfCsv(out.stderr.decode(errors='replace'), self.events)
+            active = [e for e in self.events if e in counted]
+        dropped = [e for e in self.events if e not in active]
+        if dropped:
+            pipedPrint("Warning: perf cannot count", ', '.join(dropped), "on this host, leaving them empty")
+        return active
+
+    def _probeOne(self, event):
+        try:
+            out = subprocess.run([self.perf, "stat", "-x,", "-e", event, "--", "true"],
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30)
+        except (OSError, subprocess.SubprocessError):
+            return False
+        return out.returncode == 0 and event in parsePerfCsv(out.stderr.decode(errors='replace'), [event])
+
+    def columns(self):
+        return [perfColumn(e) for e in self.events] + [d[0] for d in self.derived]
+
+    def wrap(self, cmd):
+        """(command to run, counter file or None)."""
+        if not self.active:
+            return cmd, None
+        fd, path = tempfile.mkstemp(prefix="perf-", suffix=".csv")
+        os.close(fd)
+        return [self.perf, "stat", "-x,", "-o", path, "-e", ','.join(self.active), "--"] + list(cmd), path
+
+    def collect(self, path):
+        """Reads and removes a counter file; returns the perf columns."""
+        counts = {}
+        if path:
+            try:
+                with open(path, errors='replace') as inFile:
+                    counts = parsePerfCsv(inFile.read(), self.active)
+            except OSError:
+                pass
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        data = dict((perfColumn(e), counts.get(e, MISSING)) for e in self.events)
+        for column, num, den in self.derived:
+            if counts.get(num) is not None and counts.get(den):
+                data[column] = round(counts[num] / counts[den], 4)
+            else:
+                data[column] = MISSING
+        return data
@@ -0,0 +1,209 @@
+class Plan:
+    """Lazy view of the config space described by run()'s arguments.
+
+    Iterating yields fully resolved (cmd, labels) tuples in exactly the order
+    the old index odometer produced them: the last key in order varies
+    fastest, idxMatch keys follow the index of the key they are matched to,
+    and a subConf key picks its list by the current entry of its parent key
+    (counting its range with any later parent at its first entry, as the
+    odometer did). Nothing is materialized; len() and indexing count
+    subtrees instead of walking them.
+
+    exclude and include are lists of constraints, each a dict of key ->
+    allowed label values: a cell matching every key of an exclude
+    constraint is dropped, and with include a cell must match one of them.
+    They are checked as soon as the keys they name are bound, so a pruned
+    subtree is never walked or counted.
+    """
+    def __init__(self, config, order, idxMatch={}, subConf={}, exclude=None, include=None):
+        self.config = config
+        self.order = list(order)
+        self.idxMatch = dict(idxMatch)
+        self.subConf = dict(subConf)
+        self.exclude = [_constraint(c) for c in exclude or []]
+        self.include = [_constraint(c) for c in include or []]
+        self._depth = dict((key, d) for d, key in enumerate(self.order))
+        # keys whose entry can only be resolved once every index is known
+        self._late = set(key for key in self.order if key in self.idxMatch or
+                         (key in self.subConf and self._depth.get(self.subConf[key], -1) > self._depth[key]))
+        # indexes the labels constraints look at depend on
+        constrained = set()
+        for c in self.exclude + self.include:
+            for key in c:
+                constrained.update(k for k in (key, self.subConf.get(key), self.idxMatch.get(key)) if k in self._depth)
+        # parent (and constrained) indexes a subtree's size depends on, per depth
+        self._deps = []
+        for d in range(len(self.order) + 1):
+            deps = set(k for k in constrained if self._depth[k] < d)
+            for key in self.order[d:]:
+                parent = self.subConf.get(key)
+                if parent is not None and self._depth.get(parent, len(self.order)) < d:
+                    deps.add(parent)
+            self._deps.append(sorted(deps, key=lambda k: self._depth[k]))
+        self._sizes = {}
+        self._len = None
+
+    def _entries(self, key, idx):
+        entries = self.config[key]
+        if key in self.subConf:
+            parent = self.subConf[key]
+            entries = entries[self.config[parent][idx.get(parent, 0)]['name']]
+        return entries
+
+    def _range(self, d, idx):
+        key = self.order[d]
+        if key in self.idxMatch:
+            return 1
+        return len(self._entries(key, idx))
+
+    def _allowed(self, d, idx):
+        """False once the keys bound at depths up to d rule out every cell
+        below; at the last depth late keys are bound too."""
+        if not self.exclude and not self.include:
+            return True
+        labels = {}
+        final = d == len(self.order) - 1
+        for key in self.order[:d + 1]:
+            if key in self._late and not final:
+                continue
+            conf = self._resolve(key, idx)
+            if not isinstance(conf, str):
+                labels[key] = str(conf['name'])
+        for c in self.exclude:
+            if all(k in labels and labels[k] in vals for k, vals in c.items()):
+                return False
+        if self.include:
+            return any(all(labels[k] in vals for k, vals in c.items() if k in labels) for c in self.include)
+        return True
+
+    def _size(self, d, idx):
+        if d == len(self.order):
+            return 1
+        memo = (d,) + tuple(idx.get(k, 0) for k in self._deps[d])
+        size = self._sizes.get(memo)
+        if size is None:
+            key = self.order[d]
+            size = 0
+            for i in range(self._range(d, idx)):
+                idx[key] = i
+                if self._allowed(d, idx):
+                    size += self._size(d + 1, idx)
+            idx.pop(key, None)
+            self._sizes[memo] = size
+        return size
+
+    def __len__(self):
+        if self._len is None:
+            self._len = self._size(0, {})
+        return self._len
+
+    def _resolve(self, key, idx):
+        entries = self._entries(key, idx)
+        if key in self.idxMatch:
+            return entries[idx[self.idxMatch[key]]]
+        return entries[idx[key]]
+
+    def _cell(self, idx, parts):
+        cmd = []
+        labels = {}
+        for d, key in enumerate(self.order):
+            conf = self._resolve(key, idx) if key in self._late else parts[d]
+            if (isinstance(conf, str)):
+                cmd += conf.split(' ')
+            else:
+                cmd += conf['cmd']
+                labels[key] = conf['name']
+        return cmd, labels
+
+    def _walk(self, d, idx, parts):
+        if d == len(self.order):
+            yield self._cell(idx, parts)
+            return
+        key = self.order[d]
+        for i in range(self._range(d, idx)):
+            idx[key] = i
+            if not self._allowed(d, idx):
+                continue
+            if key not in self._late:
+                parts[d] = self._resolve(key, idx)
+            yield from self._walk(d + 1, idx, parts)
+        # a later subConf key looks up this parent at its first entry
+        idx[key] = 0
+
+    def __iter__(self):
+        idx = dict((key, 0) for key in self.order)
+        return self._walk(0, idx, [None] * len(self.order))
+
+    def __getitem__(self, i):
+        total = len(self)
+        if i < 0:
+            i += total
+        if i < 0 or i >= total:
+            raise IndexError("plan index out of range")
+        idx = dict((key, 0) for key in self.order)
+        for d, key in enumerate(self.order):
+            for j in range(self._range(d, idx)):
+                idx[key] = j
+                size = self._size(d + 1, idx) if self._allowed(d, idx) else 0
+                if i < size:
+                    break
+                i -= size
+        parts = [None if key in self._late else self._resolve(key, idx) for key in self.order]
+        return self._cell(idx, parts)
+
+    def filter(self, pred):
+        return FilteredPlan(self, pred)
+
+    def select(self, **labels):
+        """Cells whose labels match every given value (compared as strings)."""
+        want = dict((k, str(v)) for k, v in labels.items())
+        return self.filter(lambda cell: all(str(cell.get(k)) == v for k, v in want.items()))
+
+def _constraint(spec):
+    # {'threads': 1, 'graphs': ['Twitter', 'S25-E32']} -> key -> set of strings
+    return dict((key, set(str(v) for v in (vals if isinstance(vals, (list, tuple, set)) else [vals])))
+                for key, vals in spec.items())
+
+def constraintPredicate(exclude=None, include=None):
+    """Predicate over labels with the exclude/include semantics of Plan."""
+    exclude = [_constraint(c) for c in exclude or []]
+    include = [_constraint(c) for c in include or []]
+    def matches(c, labels):
+        return all(str(labels.get(k)) in vals for k, vals in c.items())
+    return lambda labels: (not any(matches(c, labels) for c in exclude) and
+                           (not include or any(matches(c, labels) for c in include)))
+
+class FilteredPlan:
+    """Cells of a plan for which pred(labels) holds; still lazy, len() walks it."""
+    def __init__(self, plan, pred):
+        self.plan = plan
+        self.pred = pred
+        self.config = plan.config
+
+    def __iter__(self):
+        for cmd, labels in self.plan:
+            if self.pred(labels):
+                yield cmd, labels
+
+    def __len__(self):
+        return sum(1 for cell in self)
+
+    def filter(self, pred):
+        return FilteredPlan(self, pred)
+
+def parseFilters(specs):
+    """['threads=4', 'graphs=S23-E8,S25-E8'] -> predicate over labels."""
+    want = {}
+    for spec in specs or []:
+        key, sep, vals = spec.partition('=')
+        if not sep:
+            raise ValueError("Filter must look like key=value[,value...]: " + spec)
+        want.setdefault(key.strip(), set()).update(v.strip() for v in vals.split(','))
+    return lambda labels: all(str(labels.get(k)) in vals for k, vals in want.items())
+
+def printPlan(plan, out=None):
+    count = 0
+    for i, (cmd, labels) in enumerate(plan):
+        print("%d\t%s\t%s" % (i, ' '.join(cmd), ' '.join("%s=%s" % kv for kv in labels.items())), file=out)
+        count += 1
+    return count
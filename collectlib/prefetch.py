@@ -0,0 +1,130 @@
+import os
+import time
+import threading
+
+from collectlib.runner import pipedPrint
+
+READ_BLOCK = 8 << 20
+# Never prefetch a file larger than this fraction of MemAvailable; pulling it
+# in would just evict the graph that is currently running.
+MAX_MEM_FRACTION = 0.5
+
+def memAvailable():
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def warmFile(path):
+    """Pulls a file into the page cache; returns (seconds, bytes read)."""
+    start = time.monotonic()
+    total = 0
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        # fadvise is only a hint and NFS mostly ignores it, so read it through
+        while True:
+            chunk = os.read(fd, READ_BLOCK)
+            if not chunk:
+                break
+            total += len(chunk)
+    finally:
+        os.close(fd)
+    return time.monotonic() - start, total
+
+class GraphPrefetcher:
+    """Warms graph files on a background thread and keeps per-file load stats.
+
+    Everything is keyed by path: the .g and .w.g files of a graph share a
+    display name but are loaded separately.
+    """
+    def __init__(self, quiet=False):
+        self.quiet = quiet
+        self.names = {}
+        self.loads = {}
+        self.runWall = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _warm(self, path):
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return
+        avail = memAvailable()
+        if avail is not None and size > avail * MAX_MEM_FRACTION:
+            if not self.quiet:
+                pipedPrint("Prefetch: skipping", path, "(%.1f GB, too large for free memory)" % (size / 1e9))
+            return
+        try:
+            secs, total = warmFile(path)
+        except OSError:
+            return
+        with self._lock:
+            self.loads[path] = (secs, total)
+
+    def prefetch(self, name, path):
+        if path in self._threads:
+            return
+        self.names[path] = name
+        thread = threading.Thread(target=self._warm, args=(path,), name="prefetch-" + str(name), daemon=True)
+        self._threads[path] = thread
+        thread.start()
+
+    def load(self, name, path):
+        """Warms a graph in the foreground (the first graph has nobody ahead of it)."""
+        if path not in self._threads:
+            self.names[path] = name
+            self._threads[path] = threading.current_thread()
+            self._warm(path)
+
+    def addRun(self, path, wall):
+        with self._lock:
+            self.runWall[path] = self.runWall.get(path, 0.0) + (wall or 0.0)
+
+    def report(self):
+        for thread in self._threads.values():
+            if thread is not threading.current_thread():
+                thread.join()
+        for path, wall in self.runWall.items():
+            name = "%s (%s)" % (self.names.get(path, path), os.path.basename(path))
+            secs, total = self.loads.get(path, (None, 0))
+            if secs is None:
+                pipedPrint("Graph %s: load not measured, runs %.1fs" % (name, wall))
+                continue
+            frac = secs / (secs + wall) if secs + wall > 0 else 0.0
+            pipedPrint("Graph %s: load %.1fs (%.0f MB), runs %.1fs, load fraction %.1f%%" % (name, secs, total / 1e6, wall, 100 * frac))
+
+def groupedConfigs(configs, config, key):
+    """Reorders a config stream so that all configs of one config[key] entry run together.
+
+    configs must be re-iterable (a Plan); it is walked once per entry so
+    nothing is materialized, and the relative order inside each group is
+    unchanged.
+    """
+    for entry in config[key]:
+        if isinstance(entry, str):
+            raise ValueError("Cannot group by '" + key + "': its entries have no name")
+        for cmd, confDict in configs:
+            if confDict.get(key) == entry['name']:
+                yield cmd, confDict
+
+def prefetchingConfigs(configs, config, key, prefetcher):
+    """Passes configs through, warming the next group's file when a group starts."""
+    files = [(entry['name'], entry['cmd'][-1]) for entry in config[key]]
+    position = dict((name, i) for i, (name, path) in enumerate(files))
+    current = None
+    for cmd, confDict in configs:
+        name = confDict.get(key)
+        if name != current and name in position:
+            current = name
+            i = position[name]
+            prefetcher.load(name, files[i][1])
+            if i + 1 < len(files):
+                prefetcher.prefetch(*files[i + 1])
+        yield cmd, confDict
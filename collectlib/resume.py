@@ -0,0 +1,33 @@
+import csv
+import os
+
+from collectlib.extract import MISSING
+from collectlib.runner import STATUS_OK
+from collectlib.shard import CELL
+
+class ResumeIndex:
+    """Label tuples already present in an existing result file.
+
+    A config counts as done when some row matches every one of its labels,
+    so the same file can hold rows from sweeps with different label sets.
+    Only ok rows count (or rows of files without a status column), so runs
+    that failed, timed out or were skipped are made again.
+    The shard cell number is not compared: it depends on the whole plan
+    (filters, budget, history), so it changes when the plan does.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._rows = []
+        self._index = {}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, newline='') as inFile:
+                self._rows = [row for row in csv.DictReader(inFile) if row.get('status') in (None, '', MISSING, STATUS_OK)]
+
+    def __len__(self):
+        return len(self._rows)
+
+    def isDone(self, labels):
+        keys = tuple(sorted(k for k in labels if k != CELL))
+        if keys not in self._index:
+            self._index[keys] = set(tuple(row.get(k) for k in keys) for row in self._rows)
+        return tuple(str(labels[k]) for k in keys) in self._index[keys]
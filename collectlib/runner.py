@@ -0,0 +1,316 @@
+import os
+import sys
+import time
+import shutil
+import signal
+import selectors
+import subprocess
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_TIMEOUT = 'timeout'
+STATUS_STALLED = 'stalled'
+# not run: dominated by a config that already failed (see collectlib.infeasible)
+STATUS_INFEASIBLE = 'infeasible'
+
+READ_CHUNK = 1 << 16
+# Longest line kept in the line buffer; anything beyond is dropped so that a
+# process spewing output without newlines cannot grow memory without bound.
+MAX_LINE = 1 << 20
+
+def pipedPrint(*args):
+    print(' '.join(str(a) for a in args))
+    sys.stdout.flush()
+
+# Kernel rusage of a run (wait4), added to every result row
+USAGE_COLUMNS = ('user_s', 'sys_s', 'maxrss_kb', 'nvcsw', 'nivcsw', 'majflt', 'minflt')
+
+def _waitUsage(proc):
+    """Reaps proc with wait4 and returns its rusage as a dict of USAGE_COLUMNS.
+
+    The counts cover the run and any children it waited for; maxrss_kb is
+    the largest single process, which for tiny runs is dominated by the
+    forked collector before exec. Empty where wait4 is not available.
+    """
+    if not hasattr(os, 'wait4'):
+        proc.wait()
+        return {}
+    try:
+        pid, status, ru = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        proc.wait()
+        return {}
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {'user_s': round(ru.ru_utime, 3), 'sys_s': round(ru.ru_stime, 3), 'maxrss_kb': ru.ru_maxrss,
+            'nvcsw': ru.ru_nvcsw, 'nivcsw': ru.ru_nivcsw, 'majflt': ru.ru_majflt, 'minflt': ru.ru_minflt}
+
+def _killGroup(proc):
+    # the run is its own session leader, so this also takes out anything it forked
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+
+def _copyStderr(fd, recording):
+    chunk = os.read(fd, READ_CHUNK)
+    if chunk:
+        recording.stderr.write(chunk)
+        sys.stderr.buffer.write(chunk)
+        sys.stderr.flush()
+    return bool(chunk)
+
+TASKSET = shutil.which('taskset')
+
+def _pinnedCmd(cmd, cpus):
+    # taskset sets the affinity before exec, so threads the run starts
+    # early are pinned too; preexec_fn is not safe in the sweep's threads
+    if not cpus or not TASKSET:
+        return cmd
+    return [TASKSET, '-c', ','.join(str(c) for c in sorted(cpus))] + list(cmd)
+
+def _pinSpawned(proc, cpus):
+    # without taskset, pin right after the spawn instead
+    if cpus and not TASKSET:
+        try:
+            os.sched_setaffinity(proc.pid, cpus)
+        except OSError:
+            pass
+
+class StreamParser:
+    """Per-run parser fed decoded output lines.
+
+    The runner hands over blocks of complete lines through feedText(),
+    which parsers may override to scan a whole block at once; by default
+    it calls feed() per line. feed() returns True once the parser has everything it needs, after which
+    the runner stops feeding it; result() may be called at any point, which
+    is what lets a killed run still report partial data.
+    """
+    def feed(self, line):
+        return False
+
+    def feedText(self, text):
+        for line in text.split('\n'):
+            if self.feed(line):
+                return True
+        return False
+
+    def result(self):
+        return {}
+
+class LinesParser(StreamParser):
+    def __init__(self, fn):
+        self.fn = fn
+        self.lines = []
+
+    def feed(self, line):
+        self.lines.append(line)
+        return False
+
+    def result(self):
+        return self.fn(self.lines)
+
+class LinesExtractor:
+    """Adapts a classic extractRes(lines) function to the streaming runner."""
+    def __init__(self, fn):
+        self.fn = fn
+
+    def newParser(self):
+        return LinesParser(self.fn)
+
+class ParserExtractor:
+    """Builds a fresh parserClass(*args) for every run."""
+    def __init__(self, parserClass, *args):
+        self.parserClass = parserClass
+        self.args = args
+
+    def newParser(self):
+        return self.parserClass(*self.args)
+
+def asExtractor(extractRes):
+    if hasattr(extractRes, 'newParser'):
+        return extractRes
+    return LinesExtractor(extractRes)
+
+class RunResult:
+    cached = False
+    # the Recording of the run's raw output, when it was archived
+    recording = None
+
+    def __init__(self, status, data, returncode=None, wall=None, usage=None, counters=None):
+        self.status = status
+        self.data = data
+        self.returncode = returncode
+        self.wall = wall
+        self.usage = usage or {}
+        self.counters = counters or {}
+
+    @property
+    def ok(self):
+        return self.status == STATUS_OK
+
+class Runner:
+    """Launches runs; with perf (a PerfStat) every execStream run is wrapped
+    in perf stat and its counters come back on RunResult.counters, with
+    membind (a NumaBind) its memory is bound to one NUMA node."""
+    def __init__(self, testCmd=None, perf=None, membind=None):
+        self.testCmd = testCmd
+        self.perf = perf
+        self.membind = membind
+
+    def context(self):
+        """What besides the command changes a run's result, for cache keys."""
+        return {
+            "test": self.testCmd,
+            "perf": self.perf.active if self.perf else None,
+            "membind": self.membind.node if self.membind and self.membind.active else None,
+        }
+
+    def _announce(self, cmd, quiet, cpus):
+        if quiet:
+            return
+        if cpus:
+            pipedPrint("Executing:", ' '.join(cmd), "[cpus " + ','.join(str(c) for c in sorted(cpus)) + "]")
+        else:
+            pipedPrint("Executing:", ' '.join(cmd))
+
+    def execToLines(self, cmd, timeout=None, quiet=False, cpus=None):
+        self._announce(cmd, quiet, cpus)
+
+        if self.testCmd:
+            cmd = self.testCmd
+
+        try:
+            with subprocess.Popen(_pinnedCmd(cmd, cpus), stdout=subprocess.PIPE) as proc:
+                _pinSpawned(proc, cpus)
+                try:
+                    out = proc.communicate(timeout=timeout)[0]
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+                    return None
+            if proc.returncode:
+                return None
+            lines = out.decode(sys.stdout.encoding).split('\n')
+        except:
+            return None
+        return lines
+
+    def execStream(self, cmd, extractor, timeout=None, quiet=False, cpus=None, killOnDone=False, idleTimeout=None, recording=None):
+        """Run cmd and feed its stdout to a fresh parser line by line as it arrives.
+
+        Only the current partial line is buffered. Once the parser reports it
+        is done, remaining output is drained unparsed (or the process is
+        killed with killOnDone). The run gets its own process group, which
+        is killed when the run exceeds timeout (STATUS_TIMEOUT) or prints
+        nothing for idleTimeout seconds (STATUS_STALLED); the partial result
+        is returned either way. With a recording (see collectlib.archive)
+        every byte of stdout and stderr is also written to it, including
+        output drained after parsing is done; stderr is still echoed.
+        """
+        self._announce(cmd, quiet, cpus)
+
+        if self.testCmd:
+            cmd = self.testCmd
+
+        perfOut = None
+        if self.perf:
+            cmd, perfOut = self.perf.wrap(cmd)
+        if self.membind:
+            cmd = self.membind.wrap(cmd)
+
+        parser = extractor.newParser()
+        start = time.monotonic()
+        deadline = start + timeout if timeout else None
+        try:
+            proc = subprocess.Popen(_pinnedCmd(cmd, cpus), stdout=subprocess.PIPE, stderr=subprocess.PIPE if recording else None,
+                                    start_new_session=True)
+            _pinSpawned(proc, cpus)
+        except OSError:
+            parser.feed("")
+            return RunResult(STATUS_ERROR, parser.result(), counters=self.perf.collect(perfOut) if self.perf else None)
+
+        fd = proc.stdout.fileno()
+        sel = selectors.DefaultSelector()
+        sel.register(fd, selectors.EVENT_READ)
+        errFd = None
+        if recording:
+            errFd = proc.stderr.fileno()
+            sel.register(errFd, selectors.EVENT_READ)
+        buf = b''
+        parsing = True
+        status = None
+        lastOutput = start
+        finished = False
+        try:
+            while True:
+                wait = None
+                now = time.monotonic()
+                if deadline:
+                    wait = deadline - now
+                    if wait <= 0:
+                        status = STATUS_TIMEOUT
+                        break
+                if idleTimeout:
+                    idle = lastOutput + idleTimeout - now
+                    if idle <= 0:
+                        status = STATUS_STALLED
+                        break
+                    wait = idle if wait is None else min(wait, idle)
+                ready = sel.select(wait)
+                if not ready:
+                    continue
+                if errFd is not None and any(key.fd == errFd for key, events in ready):
+                    lastOutput = time.monotonic()
+                    if not _copyStderr(errFd, recording):
+                        sel.unregister(errFd)
+                        errFd = None
+                    if not any(key.fd == fd for key, events in ready):
+                        continue
+                chunk = os.read(fd, READ_CHUNK)
+                if not chunk:
+                    finished = True
+                    break
+                lastOutput = time.monotonic()
+                if recording:
+                    recording.stdout.write(chunk)
+                if not parsing:
+                    continue
+                buf += chunk
+                cut = buf.rfind(b'\n')
+                if cut < 0:
+                    if len(buf) > MAX_LINE:
+                        buf = buf[:MAX_LINE]
+                    continue
+                text = buf[:cut].decode(errors='replace')
+                buf = buf[cut + 1:]
+                if len(buf) > MAX_LINE:
+                    buf = buf[:MAX_LINE]
+                if parser.feedText(text):
+                    parsing = False
+                if not parsing:
+                    buf = b''
+                    if killOnDone:
+                        break
+            if parsing and buf:
+                parser.feed(buf.decode(errors='replace'))
+            if finished and errFd is not None:
+                # whatever the run wrote to stderr before it closed stdout
+                sel.unregister(fd)
+                while sel.select(0) and _copyStderr(errFd, recording):
+                    pass
+        finally:
+            sel.close()
+            if not finished:
+                _killGroup(proc)
+            proc.stdout.close()
+            if proc.stderr:
+                proc.stderr.close()
+            usage = _waitUsage(proc)
+
+        wall = time.monotonic() - start
+        if status is None:
+            if proc.returncode == 0 or (killOnDone and not parsing):
+                status = STATUS_OK
+            else:
+                status = STATUS_ERROR
+        counters = self.perf.collect(perfOut) if self.perf else None
+        return RunResult(status, parser.result(), proc.returncode, wall, usage, counters)
@@ -0,0 +1,113 @@
+import csv
+
+from collectlib.costmodel import formatSeconds
+from collectlib.extract import MISSING
+from collectlib.runner import pipedPrint
+
+CELL = 'cell'
+
+def parseShard(spec):
+    """"i/N" -> (i, N) with 0 <= i < N."""
+    index, sep, count = spec.partition('/')
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise ValueError("Shard must look like i/N, e.g. 0/4: " + spec)
+    if not sep or count < 1 or not 0 <= index < count:
+        raise ValueError("Shard index must be in [0, N): " + spec)
+    return index, count
+
+def assignShards(plans, count, costModel=None):
+    """Shard number of every cell of plans, in canonical (plan, cell) order.
+
+    Without a cost model cells are dealt round-robin. With one they go,
+    longest predicted first, to the least loaded shard, so every shard ends
+    up with about the same predicted wall-clock. Ties break on cell and
+    shard number, so every node computes the same split as long as it is
+    given the same plans and history.
+    """
+    cells = [labels for plan in plans for cmd, labels in plan]
+    if costModel is None:
+        return [cell % count for cell in range(len(cells))], None
+
+    costs = [costModel.predict(labels) for labels in cells]
+    loads = [0.0] * count
+    shards = [0] * len(cells)
+    for cell in sorted(range(len(cells)), key=lambda c: (-costs[c], c)):
+        shard = min(range(count), key=lambda s: (loads[s], s))
+        shards[cell] = shard
+        loads[shard] += costs[cell]
+    return shards, loads
+
+class ShardPlan:
+    """The cells of one plan owned by a shard, labelled with their global cell number."""
+    def __init__(self, plan, offset, shards, index):
+        self.plan = plan
+        self.config = plan.config
+        self.offset = offset
+        self.shards = shards
+        self.index = index
+
+    def __iter__(self):
+        for i, (cmd, labels) in enumerate(self.plan):
+            cell = self.offset + i
+            if self.shards[cell] == self.index:
+                yield cmd, dict([(CELL, cell)] + list(labels.items()))
+
+    def __len__(self):
+        return sum(1 for cell in self)
+
+def shardPlans(plans, spec, costModel=None, quiet=False):
+    """Restricts plans to the cells of shard spec ("i/N")."""
+    index, count = parseShard(spec)
+    shards, loads = assignShards(plans, count, costModel)
+    sharded = []
+    offset = 0
+    for plan in plans:
+        size = len(plan)
+        sharded.append(ShardPlan(plan, offset, shards, index))
+        offset += size
+    if not quiet:
+        mine = sum(1 for s in shards if s == index)
+        if loads is None:
+            pipedPrint("Shard %d/%d: %d of %d configs (round-robin)" % (index, count, mine, len(shards)))
+        else:
+            pipedPrint("Shard %d/%d: %d of %d configs, ~%s predicted (shards range %s to %s)" % (index, count, mine, len(shards), formatSeconds(loads[index]), formatSeconds(min(loads)), formatSeconds(max(loads))))
+    return sharded
+
+def mergeCsvs(paths, outPath):
+    """Combines shard result files into one, back in canonical cell order.
+
+    The header is the union of the inputs' columns in first-seen order;
+    columns a file lacks are filled with MISSING. Rows are sorted by cell
+    when every input has one (a later duplicate of a cell, e.g. from a
+    rerun shard, is dropped), otherwise kept in file order. Returns the
+    number of rows written.
+    """
+    header = []
+    rows = []
+    for path in paths:
+        with open(path, newline='') as inFile:
+            reader = csv.DictReader(inFile)
+            for key in reader.fieldnames or []:
+                if key not in header:
+                    header.append(key)
+            rows += list(reader)
+
+    if rows and all((row.get(CELL) or '').isdigit() for row in rows):
+        seen = {}
+        for row in rows:
+            cell = int(row[CELL])
+            if cell in seen:
+                pipedPrint("Warning: duplicate cell", cell, "dropped")
+                continue
+            seen[cell] = row
+        rows = [seen[cell] for cell in sorted(seen)]
+    elif CELL in header:
+        pipedPrint("Warning: not every row has a cell number, keeping file order")
+
+    with open(outPath, 'w', newline='') as outFile:
+        writer = csv.DictWriter(outFile, header, restval=MISSING)
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
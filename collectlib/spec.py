@@ -0,0 +1,99 @@
+import json
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+from collectlib.catalog import displayName
+from collectlib.costmodel import formatSeconds
+from collectlib.plan import Plan
+from collectlib.runner import pipedPrint
+
+def loadSpec(path):
+    """A sweep spec from a .json or .toml file."""
+    if path.endswith('.toml'):
+        if tomllib is None:
+            raise ValueError("TOML specs need Python 3.11 (tomllib); use JSON instead")
+        with open(path, 'rb') as inFile:
+            return tomllib.load(inFile)
+    with open(path) as inFile:
+        return json.load(inFile)
+
+def _pair(name, cmd):
+    return {"name": name, "cmd": cmd.split(' ') if isinstance(cmd, str) else list(cmd)}
+
+def _entries(axis, spec):
+    """Config entries of one axis.
+
+    An axis is a list of plain strings (unlabeled options) or of
+    {"name", "cmd"} objects, {"option": "-w", "values": [1, 2]},
+    {"files": [...], "prefix": ..., "suffix": ...} (graphs, named like the
+    catalog names them) or {"per": parent, ...} whose "values" map each
+    entry of the parent axis to its own list (e.g. start_vtx per graph).
+    """
+    if isinstance(spec, list):
+        return [e if isinstance(e, str) else _pair(e["name"], e["cmd"]) for e in spec]
+    if "per" in spec:
+        sub = dict((k, v) for k, v in spec.items() if k not in ("per", "values"))
+        return dict((parent, _entries(axis, dict(sub, values=vals))) for parent, vals in spec["values"].items())
+    if "files" in spec:
+        paths = [spec.get("prefix", "") + f + spec.get("suffix", "") for f in spec["files"]]
+        return [_pair(displayName(path), [path]) for path in paths]
+    if "values" in spec:
+        option = spec.get("option")
+        return [_pair(v, [option, str(v)] if option else [str(v)]) for v in spec["values"]]
+    raise ValueError("Axis %s: expected a list or an object with values or files" % axis)
+
+def compileSweep(sweep, common=None):
+    """One Plan from a sweep of the spec; common holds spec-wide exclude/include."""
+    common = common or {}
+    axes = sweep["axes"]
+    order = sweep.get("order", list(axes))
+    missing = [k for k in order if k not in axes]
+    if missing:
+        raise ValueError("Sweep %s: no axis %s" % (sweep.get("name", ''), ', '.join(missing)))
+    config = dict((key, _entries(key, spec)) for key, spec in axes.items())
+    subConf = dict((key, spec["per"]) for key, spec in axes.items() if isinstance(spec, dict) and "per" in spec)
+    exclude = list(common.get("exclude", [])) + list(sweep.get("exclude", []))
+    include = list(sweep.get("include", common.get("include", [])))
+    # constraints naming an axis this sweep lacks cannot match any of its cells
+    exclude = [c for c in exclude if all(k in order for k in c)]
+    applicable = [c for c in include if all(k in order for k in c)]
+    plan = Plan(config, order, sweep.get("match", {}), subConf, exclude, applicable)
+    if include and not applicable:
+        # an empty include list would let every cell through instead
+        pipedPrint("Warning: sweep %s has no include constraint on its axes, so no cells" % sweep.get("name", ''))
+        return plan.filter(lambda labels: False)
+    return plan
+
+def compileSpec(spec, names=None):
+    """[(sweep name, Plan)] for the spec's sweeps, or only those in names."""
+    plans = []
+    for i, sweep in enumerate(spec.get("sweeps", [])):
+        name = sweep.get("name", str(i))
+        if names and name not in names:
+            continue
+        plans.append((name, compileSweep(sweep, spec)))
+    return plans
+
+def trimToBudget(plans, costModel, seconds, jobs=1):
+    """Drops the configs predicted to take longest until the predicted wall
+    time (total over jobs) fits in seconds; returns the filtered plans."""
+    costs = []
+    for p, plan in enumerate(plans):
+        for cmd, labels in plan:
+            costs.append((costModel.predict(labels), p, tuple(sorted((k, str(v)) for k, v in labels.items()))))
+    total = sum(c[0] for c in costs)
+    budget = seconds * max(1, jobs)
+    dropped = set()
+    for cost, p, key in sorted(costs, reverse=True):
+        if total <= budget:
+            break
+        dropped.add((p, key))
+        total -= cost
+    if dropped:
+        pipedPrint("Budget: dropping %d of %d configs (longest first) to fit %s; %s of runs remain" % (len(dropped), len(costs), formatSeconds(seconds), formatSeconds(total)))
+    def keep(p):
+        return lambda labels: (p, tuple(sorted((k, str(v)) for k, v in labels.items()))) not in dropped
+    return [plan.filter(keep(p)) if dropped else plan for p, plan in enumerate(plans)]
@@ -0,0 +1,204 @@
+import os
+import json
+import mmap
+import random
+import threading
+from bisect import bisect_right
+from collections import deque
+
+from collectlib.cache import fileFingerprint
+from collectlib.runner import pipedPrint
+
+LIGRA_HEADERS = (b'AdjacencyGraph', b'WeightedAdjacencyGraph')
+CHUNK = 1 << 20
+CACHED_CHUNKS = 8
+
+class _Lines:
+    """Random access to the lines of mm from byte start on, without splitting
+    the whole file: newlines are counted chunk by chunk (in C) only as far
+    as the highest line asked for, and a few decoded chunks are kept."""
+    def __init__(self, mm, start):
+        self.mm = mm
+        self.chunkStarts = [start]
+        self.firstLines = [0]
+        self.done = start >= len(mm)
+        self._decoded = {}
+
+    def _extend(self, line):
+        mm, end = self.mm, len(self.mm)
+        while not self.done and self.firstLines[-1] <= line:
+            pos = self.chunkStarts[-1]
+            cut = min(pos + CHUNK, end)
+            if cut < end:
+                nl = mm.find(b'\n', cut)
+                cut = end if nl < 0 else nl + 1
+            count = mm[pos:cut].count(b'\n')
+            if cut == end and mm[end - 1:end] != b'\n':
+                count += 1
+            self.chunkStarts.append(cut)
+            self.firstLines.append(self.firstLines[-1] + count)
+            self.done = cut >= end
+
+    def _chunk(self, c):
+        lines = self._decoded.get(c)
+        if lines is None:
+            if len(self._decoded) >= CACHED_CHUNKS:
+                self._decoded.pop(next(iter(self._decoded)))
+            lines = self.mm[self.chunkStarts[c]:self.chunkStarts[c + 1]].split(b'\n')
+            self._decoded[c] = lines
+        return lines
+
+    def ints(self, first, last):
+        """The integers on lines first..last-1."""
+        out = []
+        if last <= first:
+            return out
+        self._extend(last - 1)
+        if last > self.firstLines[-1]:
+            raise ValueError("Line %d is past the end of the file" % (last - 1))
+        c = bisect_right(self.firstLines, first) - 1
+        line = first
+        while line < last:
+            lines = self._chunk(c)
+            base = self.firstLines[c]
+            stop = min(last, self.firstLines[c + 1])
+            out += [int(v) for v in lines[line - base:stop - base]]
+            line = stop
+            c += 1
+        return out
+
+class LigraGraph:
+    """A Ligra text adjacency file (.g / .w.g) read through mmap.
+
+    Layout: header, n, m, then n offset lines, m edge lines and, for
+    weighted graphs, m weight lines. Degrees come from consecutive offsets
+    and neighbor lists from the matching edge lines, so sampling a few
+    vertices touches only the chunks around them.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError("Empty graph file: " + path)
+        head = self._mm[:256].split(b'\n', 3)
+        if len(head) < 4 or head[0].strip() not in LIGRA_HEADERS:
+            self.close()
+            raise ValueError("Not a Ligra adjacency graph: " + path)
+        self.weighted = head[0].strip() == LIGRA_HEADERS[1]
+        self.n = int(head[1])
+        self.m = int(head[2])
+        self._lines = _Lines(self._mm, len(head[0]) + len(head[1]) + len(head[2]) + 3)
+
+    def close(self):
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _edgeRange(self, v):
+        if v + 1 < self.n:
+            first, last = self._lines.ints(v, v + 2)
+        else:
+            first, last = self._lines.ints(v, v + 1)[0], self.m
+        return first, last
+
+    def degree(self, v):
+        first, last = self._edgeRange(v)
+        return last - first
+
+    def neighbors(self, v, limit=None):
+        first, last = self._edgeRange(v)
+        if limit is not None:
+            last = min(last, first + limit)
+        return self._lines.ints(self.n + first, self.n + last)
+
+    def reach(self, v, limit, maxExpand=256):
+        """Vertices reached by a BFS from v, stopping at limit of them or after
+        expanding maxExpand vertices."""
+        seen = {v}
+        frontier = deque([v])
+        expanded = 0
+        while frontier and len(seen) < limit and expanded < maxExpand:
+            u = frontier.popleft()
+            expanded += 1
+            for w in self.neighbors(u, limit - len(seen)):
+                if w not in seen:
+                    seen.add(w)
+                    frontier.append(w)
+        return len(seen)
+
+def sampleSources(graph, count, seed=0, minDegree=1, minReach=100, maxTries=None):
+    """count distinct vertices of out-degree >= minDegree from which a BFS
+    reaches at least minReach vertices (or the whole graph, if smaller)."""
+    rng = random.Random(seed)
+    need = min(minReach, graph.n)
+    tries = maxTries or max(100, 50 * count)
+    chosen = []
+    for i in range(tries):
+        if len(chosen) >= count:
+            break
+        v = rng.randrange(graph.n)
+        if v in chosen or graph.degree(v) < minDegree:
+            continue
+        if graph.reach(v, need) >= need:
+            chosen.append(v)
+    return chosen
+
+class StartVertexCache:
+    """Generated sources per graph file, kept in one JSON file.
+
+    An entry is reused while the file's fingerprint and the sampling
+    parameters are unchanged.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as inFile:
+                self.entries = json.load(inFile)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def sources(self, graphPath, count, seed=0, minDegree=1, minReach=100):
+        params = [count, seed, minDegree, minReach]
+        key = os.path.abspath(graphPath)
+        fingerprint = fileFingerprint(graphPath)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry and entry["fingerprint"] == fingerprint and entry["params"] == params:
+            return entry["vertices"]
+        with LigraGraph(graphPath) as graph:
+            vertices = sampleSources(graph, count, seed, minDegree, minReach)
+        if len(vertices) < count:
+            pipedPrint("Warning: only found", len(vertices), "of", count, "start vertices reaching", minReach, "vertices in", graphPath)
+        with self._lock:
+            self.entries[key] = {"fingerprint": fingerprint, "params": params, "vertices": vertices}
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as outFile:
+                json.dump(self.entries, outFile, indent=1)
+            os.replace(tmp, self.path)
+        return vertices
+
+def generateStartVertices(graphs, count, cache, **kw):
+    """dict of graph name -> start vertex ids for the graphs (name/cmd pairs)
+    whose file is a Ligra graph; others are left out with a warning."""
+    table = {}
+    for graph in graphs:
+        path = graph["cmd"][-1]
+        if not os.path.isfile(path):
+            pipedPrint("Warning:", path, "not found, keeping the listed start vertices of", graph["name"])
+            continue
+        try:
+            table[graph["name"]] = cache.sources(path, count, **kw)
+        except ValueError as e:
+            pipedPrint("Warning:", e, "- keeping the listed start vertices of", graph["name"])
+    return table
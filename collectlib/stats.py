@@ -0,0 +1,112 @@
+import math
+import random
+
+# two-sided 95% Student t critical values by degrees of freedom
+_T95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+def t95(df):
+    if df < 1:
+        return math.inf
+    if df <= len(_T95):
+        return _T95[df - 1]
+    return 1.96
+
+def mean(vals):
+    return sum(vals) / len(vals)
+
+def stddev(vals):
+    if len(vals) < 2:
+        return 0.0
+    m = mean(vals)
+    return math.sqrt(sum((v - m) ** 2 for v in vals) / (len(vals) - 1))
+
+def ciHalfWidth(vals):
+    if len(vals) < 2:
+        return math.inf
+    return t95(len(vals) - 1) * stddev(vals) / math.sqrt(len(vals))
+
+def ciConverged(vals, relWidth):
+    """True once the 95% CI half-width is within relWidth of the mean."""
+    half = ciHalfWidth(vals)
+    if half == 0:
+        return True
+    m = mean(vals)
+    if m == 0:
+        return False
+    return half / abs(m) <= relWidth
+
+def _normalSf(z):
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+def _exactU(n1, n2):
+    """Counts of each U value over all orderings of n1 + n2 untied samples."""
+    # counts[i][j] is the distribution for i and j samples, built up row by row
+    prev = [[1] for j in range(n2 + 1)]
+    for i in range(1, n1 + 1):
+        cur = [[1]]
+        for j in range(1, n2 + 1):
+            # the largest sample is from the first group (adds j to U) or the second
+            a, b = prev[j], cur[j - 1]
+            dist = [0] * (i * j + 1)
+            for u, c in enumerate(a):
+                dist[u + j] += c
+            for u, c in enumerate(b):
+                dist[u] += c
+            cur.append(dist)
+        prev = cur
+    return prev[n2]
+
+def mannWhitney(a, b):
+    """(U of a, two-sided p) of the Mann-Whitney U test.
+
+    Exact for small samples without ties, otherwise the normal
+    approximation with tie and continuity correction.
+    """
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return math.nan, math.nan
+    pooled = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2.0 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    rankSum = sum(r for r, (v, g) in zip(ranks, pooled) if g == 0)
+    u = rankSum - n1 * (n1 + 1) / 2.0
+    if not ties and n1 + n2 <= 30:
+        dist = _exactU(n1, n2)
+        total = float(sum(dist))
+        lo = min(u, n1 * n2 - u)
+        p = 2 * sum(dist[:int(lo) + 1]) / total
+        return u, min(1.0, p)
+    n = n1 + n2
+    sigma = math.sqrt(n1 * n2 / 12.0 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return u, 1.0
+    z = (abs(u - n1 * n2 / 2.0) - 0.5) / sigma
+    return u, min(1.0, 2 * _normalSf(max(0.0, z)))
+
+def bootstrapRatio(num, den, reps=2000, level=0.95, rng=None):
+    """Percentile bootstrap CI (low, high) of mean(num) / mean(den)."""
+    rng = rng or random.Random(0)
+    ratios = []
+    for i in range(reps):
+        n = [rng.choice(num) for v in num]
+        d = [rng.choice(den) for v in den]
+        md = mean(d)
+        if md:
+            ratios.append(mean(n) / md)
+    if not ratios:
+        return math.nan, math.nan
+    ratios.sort()
+    tail = (1 - level) / 2
+    return ratios[int(tail * (len(ratios) - 1))], ratios[int(round((1 - tail) * (len(ratios) - 1)))]
@@ -0,0 +1,269 @@
+import os
+import sys
+import csv
+import json
+import mmap
+import time
+import struct
+import threading
+from array import array
+from itertools import groupby
+
+from collectlib.extract import MISSING, toNumber
+
+SEGMENT_MAGIC = b'CSEG1\n'
+SEGMENT_SUFFIX = '.seg'
+_HEADER_LEN = struct.Struct('<I')
+
+COL_INT = 'q'
+COL_FLOAT = 'd'
+COL_STR = 'str'
+
+# When a segment is written: only on close(), every batchRows rows, or every
+# batch followed by an fsync of the segment and the store directory.
+DURABILITY_CLOSE = 'close'
+DURABILITY_BATCH = 'batch'
+DURABILITY_FSYNC = 'fsync'
+DURABILITY = (DURABILITY_CLOSE, DURABILITY_BATCH, DURABILITY_FSYNC)
+
+def _isMissing(val):
+    return val is None or val == MISSING or val == ''
+
+def _columnType(vals):
+    kind = COL_INT
+    for val in vals:
+        if _isMissing(val):
+            continue
+        if isinstance(val, bool) or not isinstance(val, (int, float)):
+            return COL_STR
+        if isinstance(val, float):
+            kind = COL_FLOAT
+    return kind
+
+def _encodeColumn(vals):
+    """(type, data bytes, mask bytes or b'') for one column of a segment."""
+    kind = _columnType(vals)
+    if kind == COL_STR:
+        data = json.dumps([None if val is None else str(val) for val in vals]).encode('utf-8')
+        return kind, data, b''
+    present = [not _isMissing(val) for val in vals]
+    fill = 0 if kind == COL_INT else float('nan')
+    data = array(kind, [val if ok else fill for val, ok in zip(vals, present)]).tobytes()
+    mask = b'' if all(present) else bytes(present)
+    return kind, data, mask
+
+class ColumnStore:
+    """Append-only directory of typed, columnar result segments.
+
+    Each segment holds a batch of rows sharing one schema, so apps with
+    different metrics simply land in different segments. Integer and float
+    columns are stored as raw machine arrays (with a presence mask only if
+    some value is missing) and read back through mmap without parsing;
+    anything else is stored as a JSON string list. Segments are written to
+    a temporary name and renamed into place, so readers never see a partial
+    one and several processes (e.g. shards) can share a store.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def segmentPaths(self):
+        names = sorted(n for n in os.listdir(self.path) if n.endswith(SEGMENT_SUFFIX))
+        return [os.path.join(self.path, n) for n in names]
+
+    def writer(self, batchRows=256, durability=DURABILITY_BATCH):
+        return StoreWriter(self, batchRows, durability)
+
+    def _writeSegment(self, rows, sync=False):
+        columns = list(rows[0])
+        meta = {"rows": len(rows), "byteorder": sys.byteorder, "columns": []}
+        blobs = []
+        offset = 0
+        for name in columns:
+            kind, data, mask = _encodeColumn([row.get(name) for row in rows])
+            meta["columns"].append({"name": name, "type": kind, "offset": offset, "length": len(data),
+                                    "mask": offset + len(data) if mask else None})
+            # keep numeric data 8-byte aligned for zero-copy casts
+            blob = data + mask
+            blob += b'\0' * (-len(blob) % 8)
+            blobs.append(blob)
+            offset += len(blob)
+
+        header = json.dumps(meta).encode('utf-8')
+        header += b' ' * (-(len(SEGMENT_MAGIC) + _HEADER_LEN.size + len(header)) % 8)
+        name = "%020d-%d-%d%s" % (time.time_ns(), os.getpid(), threading.get_ident() % 100000, SEGMENT_SUFFIX)
+        final = os.path.join(self.path, name)
+        tmp = final + '.tmp'
+        with open(tmp, 'wb') as outFile:
+            outFile.write(SEGMENT_MAGIC + _HEADER_LEN.pack(len(header)) + header)
+            for blob in blobs:
+                outFile.write(blob)
+            if sync:
+                outFile.flush()
+                os.fsync(outFile.fileno())
+        os.rename(tmp, final)
+        if sync:
+            dirFd = os.open(self.path, os.O_RDONLY)
+            try:
+                os.fsync(dirFd)
+            finally:
+                os.close(dirFd)
+        return final
+
+    def segments(self):
+        for path in self.segmentPaths():
+            yield Segment(path)
+
+    def scan(self, columns=None, where=None):
+        """Streams rows as dicts, one segment in memory at a time.
+
+        columns limits the keys returned, where is a dict of values a row
+        must have (compared as strings).
+        """
+        for segment in self.segments():
+            if where and not all(segment.hasColumn(k) for k in where):
+                continue
+            for row in segment.rows(columns, where):
+                yield row
+
+    def column(self, name):
+        """Yields (segment path, values) for every segment that has the column."""
+        for segment in self.segments():
+            if segment.hasColumn(name):
+                yield segment.path, segment.column(name)
+
+    def importCsv(self, path, batchRows=65536):
+        """Appends a result CSV, converting numeric cells; returns the row count."""
+        count = 0
+        with open(path, newline='') as inFile, self.writer(batchRows, DURABILITY_CLOSE) as writer:
+            for row in csv.DictReader(inFile):
+                for key, val in row.items():
+                    try:
+                        row[key] = toNumber(val)
+                    except (TypeError, ValueError):
+                        pass
+                writer.writeRow(row)
+                count += 1
+        return count
+
+class Segment:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as inFile:
+            head = inFile.read(len(SEGMENT_MAGIC) + _HEADER_LEN.size)
+            if head[:len(SEGMENT_MAGIC)] != SEGMENT_MAGIC:
+                raise ValueError("Not a result segment: " + path)
+            size = _HEADER_LEN.unpack(head[len(SEGMENT_MAGIC):])[0]
+            self.meta = json.loads(inFile.read(size).decode('utf-8'))
+        self.dataStart = len(SEGMENT_MAGIC) + _HEADER_LEN.size + size
+        self.rowCount = self.meta["rows"]
+        self._columns = dict((c["name"], c) for c in self.meta["columns"])
+
+    def __len__(self):
+        return self.rowCount
+
+    def columnNames(self):
+        return [c["name"] for c in self.meta["columns"]]
+
+    def hasColumn(self, name):
+        return name in self._columns
+
+    def _read(self, buf, col):
+        start = self.dataStart + col["offset"]
+        data = buf[start:start + col["length"]]
+        if col["type"] == COL_STR:
+            return [MISSING if v is None else v for v in json.loads(bytes(data).decode('utf-8'))]
+        if self.meta["byteorder"] == sys.byteorder:
+            vals = data.cast(col["type"]).tolist()
+        else:
+            vals = array(col["type"], bytes(data))
+            vals.byteswap()
+            vals = vals.tolist()
+        if col["mask"] is not None:
+            maskStart = self.dataStart + col["mask"]
+            mask = buf[maskStart:maskStart + self.rowCount]
+            vals = [v if ok else MISSING for v, ok in zip(vals, mask)]
+        return vals
+
+    def columns(self, names):
+        """dict of name -> list of values, read through one mmap."""
+        with open(self.path, 'rb') as inFile:
+            mapped = mmap.mmap(inFile.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                buf = memoryview(mapped)
+                try:
+                    return dict((name, self._read(buf, self._columns[name])) for name in names)
+                finally:
+                    buf.release()
+            finally:
+                mapped.close()
+
+    def column(self, name):
+        return self.columns([name])[name]
+
+    def rows(self, columns=None, where=None):
+        names = [n for n in (columns or self.columnNames()) if n in self._columns]
+        wanted = list(where or {})
+        data = self.columns(list(dict.fromkeys(names + wanted)))
+        want = dict((k, str(v)) for k, v in (where or {}).items())
+        for i in range(self.rowCount):
+            if want and not all(str(data[k][i]) == v for k, v in want.items()):
+                continue
+            yield dict((n, data[n][i]) for n in names)
+
+class StoreWriter:
+    """Batches rows into segments; same writeRow/writeRows interface as CSVWriter."""
+    def __init__(self, store, batchRows=256, durability=DURABILITY_BATCH):
+        if durability not in DURABILITY:
+            raise ValueError("Unknown durability policy: " + str(durability))
+        self.store = store
+        self.batchRows = max(1, batchRows)
+        self.durability = durability
+        self._batch = []
+        self._lock = threading.Lock()
+
+    def writeRows(self, dicts):
+        with self._lock:
+            self._batch += [dict(d) for d in dicts]
+            if self.durability != DURABILITY_CLOSE and len(self._batch) >= self.batchRows:
+                self._flush()
+
+    def writeRow(self, dict):
+        self.writeRows([dict])
+
+    def _flush(self):
+        # a new segment at every schema change keeps the rows in write order
+        batch, self._batch = self._batch, []
+        for schema, rows in groupby(batch, key=tuple):
+            self.store._writeSegment(list(rows), sync=self.durability == DURABILITY_FSYNC)
+
+    def flush(self):
+        with self._lock:
+            if self._batch:
+                self._flush()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class TeeWriter:
+    """Sends every row to several writers, e.g. a CSVWriter and a StoreWriter."""
+    def __init__(self, *writers):
+        self.writers = [w for w in writers if w is not None]
+
+    def writeRows(self, dicts):
+        for writer in self.writers:
+            writer.writeRows(dicts)
+
+    def writeRow(self, dict):
+        self.writeRows([dict])
+
+    def close(self):
+        for writer in self.writers:
+            if hasattr(writer, 'close'):
+                writer.close()
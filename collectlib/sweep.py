@@ -0,0 +1,243 @@
+import os
+import time
+import threading
+from itertools import groupby
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from collectlib.archive import RUN_ID
+from collectlib.cache import CACHED
+from collectlib.extract import MISSING
+from collectlib.noise import PINNED, formatCpuList
+from collectlib.plan import Plan
+from collectlib.prefetch import groupedConfigs, prefetchingConfigs
+from collectlib.infeasible import describe
+from collectlib.runner import Runner, asExtractor, pipedPrint
+
+RUN_ERR_CONTINUE = 1
+RUN_ERR_FAIL = 2
+RUN_ERR_RETRY = 3
+
+# Extra attempts for a failed run when errorBehavior asks for retries; the
+# wait before retry n is RETRY_BACKOFF * 2**n seconds.
+MAX_RETRIES = 2
+RETRY_BACKOFF = 5.0
+
+# Runs per job that a parallel sweep keeps in flight or finished but not
+# yet written while an earlier run is still going
+REORDER_WINDOW = 16
+
+def blankRes(lines):
+    return {}
+
+def threadsFromCmd(cmd, flag='-w'):
+    for i in range(len(cmd) - 1):
+        if cmd[i] == flag:
+            try:
+                return max(1, int(cmd[i + 1]))
+            except ValueError:
+                pass
+    return 1
+
+class CorePool:
+    """Hands out disjoint core sets; acquire() blocks until enough cores are free."""
+    def __init__(self, cpus=None):
+        if cpus is None:
+            cpus = os.sched_getaffinity(0)
+        self.cpus = sorted(cpus)
+        self._free = set(self.cpus)
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.cpus)
+
+    def acquire(self, count):
+        count = min(max(1, count), len(self.cpus))
+        with self._cond:
+            while len(self._free) < count:
+                self._cond.wait()
+            # lowest free cores first so a job's set stays as contiguous as possible
+            cores = sorted(self._free)[:count]
+            self._free.difference_update(cores)
+            return set(cores)
+
+    def release(self, cores):
+        with self._cond:
+            self._free.update(cores)
+            self._cond.notify_all()
+
+def execConfig(runner, cmd, confDict, extractor, timeout=None, quiet=False, errorBehavior=RUN_ERR_CONTINUE, cpus=None, idleTimeout=None, retries=MAX_RETRIES, backoff=RETRY_BACKOFF, archive=None):
+    attempt = 0
+    while True:
+        recording = archive.recording(cmd) if archive else None
+        res = runner.execStream(cmd, extractor, timeout=timeout, quiet=quiet, cpus=cpus, idleTimeout=idleTimeout, recording=recording)
+        res.recording = recording
+        if res.ok or errorBehavior == RUN_ERR_CONTINUE or attempt >= retries:
+            break
+        if recording:
+            recording.discard()
+        if not quiet:
+            pipedPrint("\tRun %s, retrying in %gs (%d/%d)..." % (res.status, backoff * 2 ** attempt, attempt + 1, retries))
+        time.sleep(backoff * 2 ** attempt)
+        attempt += 1
+
+    return resultRow(confDict, res, cpus), res
+
+def resultRow(confDict, res, cpus=None):
+    wall = round(res.wall, 3) if res.wall is not None else '---'
+    pinned = {PINNED: formatCpuList(cpus)} if cpus else {}
+    return {**confDict, **res.data, 'wall_s': wall, **res.usage, **res.counters, **pinned, 'status': res.status}
+
+def _runParallel(configs, jobs, coresFn, cpus, execFn, onResult):
+    pool = CorePool(cpus)
+
+    def job(cmd, confDict):
+        cores = pool.acquire(coresFn(cmd))
+        try:
+            return execFn(cmd, confDict, cores)
+        finally:
+            pool.release(cores)
+
+    # Rows reach onResult in submission order, as in a serial sweep, through
+    # a reorder buffer: later runs keep being submitted while an earlier one
+    # is still going, up to window runs in flight or waiting for their turn.
+    window = jobs * REORDER_WINDOW
+    configs = iter(configs)
+    running = {}
+    done = {}
+    nextSeq = 0
+    submitted = 0
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            while submitted - nextSeq < window:
+                cell = next(configs, None)
+                if cell is None:
+                    break
+                running[executor.submit(job, *cell)] = submitted
+                submitted += 1
+            if not running:
+                break
+            finished = wait(running, return_when=FIRST_COMPLETED)[0]
+            for future in finished:
+                done[running.pop(future)] = future.result()
+            while nextSeq in done:
+                onResult(*done.pop(nextSeq))
+                nextSeq += 1
+
+def _easiestFirst(configs, key, pruner):
+    for name, group in groupby(configs, key=lambda c: c[1].get(key)):
+        yield from sorted(group, key=lambda c: pruner.rank(c[1]))
+
+def run(config, order, idxMatch={}, subConf={}, extractRes=blankRes, writer=None, **kwargs):
+    runPlan(Plan(config, order, idxMatch, subConf), extractRes, writer, **kwargs)
+
+def runPlan(plan, extractRes=blankRes, writer=None, timeout=None, quiet=False, errorBehavior=RUN_ERR_CONTINUE, runner=None, jobs=1, coresFn=threadsFromCmd, cpus=None, resume=None, groupBy=None, prefetcher=None, costModel=None, progress=None, timeoutPolicy=None, retries=MAX_RETRIES, warmups=0, settings=None, cache=None, pruner=None, archive=None):
+    """Executes every (cmd, labels) cell of a Plan (or any re-iterable of cells).
+
+    With a timeoutPolicy, each cell's timeout and the inactivity limit come
+    from it instead of timeout. With cpus every run is pinned to its own
+    subset of them, even when jobs is 1. The first run of each (app, graph)
+    is preceded by warmups discarded runs, and settings (see noiseSettings)
+    are added to every row. Cells found in cache (a ResultCache) are not
+    run at all; with a cache every row gets a cached column, 1 for those.
+    With a pruner (an InfeasiblePruner) cells run easiest first (within
+    each group when grouping) and a cell dominated by one that timed out or
+    stalled is recorded with status infeasible instead of being run. With
+    an archive (an OutputArchive) the raw output of every run is kept and
+    rows get a run_id column; cached and infeasible rows have none.
+    """
+    if runner is None:
+        runner = Runner()
+
+    extractor = asExtractor(extractRes)
+    config = plan.config
+    if groupBy:
+        configs = groupedConfigs(plan, config, groupBy)
+    else:
+        configs = iter(plan)
+    skipped = [0]
+    if resume:
+        def notDone(configs):
+            for cmd, confDict in configs:
+                if resume.isDone(confDict):
+                    skipped[0] += 1
+                else:
+                    yield cmd, confDict
+        configs = notDone(configs)
+    if pruner and not groupBy:
+        configs = sorted(configs, key=lambda c: pruner.rank(c[1]))
+    elif costModel and jobs > 1 and not groupBy:
+        # longest predicted first keeps the tail of the sweep short
+        configs = sorted(configs, key=lambda c: -costModel.predict(c[1]))
+    if pruner and groupBy:
+        configs = _easiestFirst(configs, groupBy, pruner)
+    graphPaths = {}
+    if groupBy and prefetcher:
+        configs = prefetchingConfigs(configs, config, groupBy, prefetcher)
+        graphPaths = dict((e['name'], e['cmd'][-1]) for e in config[groupBy] if isinstance(e, dict))
+
+    def onResult(resDict, res):
+        if prefetcher and groupBy:
+            name = resDict.get(groupBy)
+            prefetcher.addRun(graphPaths.get(name, name), res.wall)
+        if progress:
+            progress.done(resDict, res.wall)
+        # a run's own cores (PINNED) take precedence over the sweep's setting
+        row = {**resDict, **dict((k, v) for k, v in settings.items() if k not in resDict)} if settings else resDict
+        if cache:
+            row = dict(row, **{CACHED: 1 if res.cached else 0})
+        if archive:
+            row = archive.add(res.recording, row, res.data, extractor) if res.recording else dict(row, **{RUN_ID: MISSING})
+        if writer:
+            writer.writeRow(row)
+
+    warmed = set()
+    warmLock = threading.Lock()
+
+    def execFn(cmd, confDict, cores=None):
+        limit, idle = timeout, None
+        if timeoutPolicy:
+            limit, idle = timeoutPolicy.timeout(confDict), timeoutPolicy.idle
+        if pruner:
+            failed = pruner.dominatedBy(confDict)
+            if failed is not None:
+                if not quiet:
+                    pipedPrint("Infeasible:", ' '.join(cmd), "(%s failed)" % describe(failed))
+                res = pruner.result(extractor, runner.perf)
+                return resultRow(confDict, res, cores), res
+        if cache:
+            # a pinned run is not comparable with an unpinned (or differently
+            # pinned) one; which of the --cpus cores it got depends on timing
+            # though, so only their number is part of the key
+            key = cache.key(cmd, extractor, dict(runner.context(), cpus=sorted(cpus) if cpus else None, cores=len(cores) if cores else None))
+            res = cache.get(key)
+            if res:
+                if not quiet:
+                    pipedPrint("Cached:", ' '.join(cmd))
+                return resultRow(confDict, res, cores), res
+        if warmups:
+            warmKey = (confDict.get('app'), confDict.get('graphs', confDict.get('graph')))
+            with warmLock:
+                first = warmKey not in warmed
+                warmed.add(warmKey)
+            if first:
+                for i in range(warmups):
+                    if not quiet:
+                        pipedPrint("\tWarm-up %d/%d, result discarded" % (i + 1, warmups))
+                    runner.execStream(cmd, extractor, timeout=limit, quiet=quiet, cpus=cores, idleTimeout=idle)
+        resDict, res = execConfig(runner, cmd, confDict, extractor, limit, quiet, errorBehavior, cores, idle, retries, archive=archive)
+        if pruner:
+            pruner.record(confDict, res.status)
+        if cache:
+            cache.put(key, res, cmd)
+        return resDict, res
+
+    if jobs > 1 or cpus:
+        _runParallel(configs, jobs, coresFn, cpus, execFn, onResult)
+    else:
+        for cmd, confDict in configs:
+            onResult(*execFn(cmd, confDict))
+
+    if resume and not quiet:
+        pipedPrint("Resume: skipped", skipped[0], "configs already in", resume.path)
+    if pruner and pruner.pruned and not quiet:
+        pipedPrint("Pruned", pruner.pruned, "infeasible configs")
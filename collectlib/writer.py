@@ -0,0 +1,162 @@
+import csv
+import os
+import json
+import tempfile
+import threading
+
+from collectlib.extract import MISSING
+from collectlib.runner import STATUS_OK, pipedPrint
+from collectlib.stats import mean, stddev
+
+class CSVWriter:
+    def __init__(self, outPath, append=False):
+        self.outPath = outPath
+        self.append = append
+        self.writer = None
+        self.outFile = None
+        self._lock = threading.Lock()
+    
+    def _initWriter(self, keys=None):
+        if self.writer:
+            return
+            
+        existing = self._existingHeader() if self.append else None
+        self.outFile = open(self.outPath, 'a+' if self.append else 'w+', newline='')
+        if existing:
+            # keep appended rows aligned with the header already in the file
+            missing = [k for k in keys if k not in existing]
+            if missing:
+                pipedPrint("Warning: dropping columns not in existing header of", self.outPath + ":", ', '.join(missing))
+            self.writer = csv.DictWriter(self.outFile, existing, extrasaction='ignore')
+        elif (keys):
+            self.writer = csv.DictWriter(self.outFile, keys)
+            self.writer.writeheader()
+
+    def _existingHeader(self):
+        if not os.path.exists(self.outPath) or os.path.getsize(self.outPath) == 0:
+            return None
+        with open(self.outPath, newline='') as inFile:
+            return next(csv.reader(inFile), None)
+
+    def writeRows(self, dicts):
+        with self._lock:
+            self._initWriter(dicts[0].keys())
+            self.writer.writerows(dicts)
+            self.outFile.flush()
+
+    def writeRow(self, dict):
+        self.writeRows([dict])
+
+    def close(self):
+        with self._lock:
+            if self.outFile:
+                self.outFile.close()
+                self.outFile = None
+                self.writer = None
+
+class UnionCSVWriter:
+    """A CSVWriter for rows that do not all have the same columns (e.g.
+    captured 'key: value' lines or several apps' metrics).
+
+    Rows are spooled to a temporary file as they come and written out on
+    close under the union of their columns in first-seen order, with
+    MISSING where a row lacks one, as results.py merge does.
+    """
+    def __init__(self, outPath):
+        self.outPath = outPath
+        self.header = []
+        self._seen = set()
+        self._spool = tempfile.TemporaryFile('w+', dir=os.path.dirname(os.path.abspath(outPath)))
+        self._lock = threading.Lock()
+
+    def writeRows(self, dicts):
+        with self._lock:
+            for row in dicts:
+                for key in row:
+                    if key not in self._seen:
+                        self._seen.add(key)
+                        self.header.append(key)
+                self._spool.write(json.dumps(row, default=str) + '\n')
+
+    def writeRow(self, dict):
+        self.writeRows([dict])
+
+    def close(self):
+        with self._lock:
+            if self._spool is None:
+                return
+            self._spool.seek(0)
+            with open(self.outPath, 'w', newline='') as outFile:
+                writer = csv.DictWriter(outFile, self.header, restval=MISSING)
+                if self.header:
+                    writer.writeheader()
+                for line in self._spool:
+                    writer.writerow(json.loads(line))
+            self._spool.close()
+            self._spool = None
+
+def _isNumber(val):
+    return isinstance(val, (int, float)) and not isinstance(val, bool)
+
+class AveragingWriter:
+    """Collapses the count repetitions of each config into one row.
+
+    Rows are grouped by every label in labels except repKey; once a group
+    is complete its numeric columns are written as the mean over the ok
+    repetitions, plus n, the number of those. Columns in stdColumns (all
+    numeric ones if None) also get a _std column. Other columns keep their
+    last value. A group without an ok repetition keeps the last status and
+    has its numeric columns left empty, so every group has the same columns.
+    """
+    def __init__(self, writer, labels, count, repKey='rep', stdColumns=None):
+        self.writer = writer
+        self.labels = [k for k in labels if k != repKey]
+        self.count = count
+        self.repKey = repKey
+        self.stdColumns = stdColumns
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def writeRows(self, dicts):
+        for row in dicts:
+            self.writeRow(row)
+
+    def writeRow(self, dict):
+        key = tuple(str(dict.get(k)) for k in self.labels)
+        with self._lock:
+            rows = self._groups.setdefault(key, [])
+            rows.append(dict)
+            if len(rows) < self.count:
+                return
+            del self._groups[key]
+        self.writer.writeRow(self._average(rows))
+
+    def _average(self, rows):
+        ok = [row for row in rows if row.get('status', STATUS_OK) == STATUS_OK]
+        last = (ok or rows)[-1]
+        avg = {}
+        for key in rows[-1]:
+            if key == self.repKey:
+                continue
+            vals = [row.get(key) for row in rows]
+            # a failed repetition leaves MISSING where the value would be
+            measured = all(_isNumber(v) or v in (MISSING, None) for v in vals) and any(_isNumber(v) for v in vals)
+            if key not in self.labels and key != 'status' and (measured or key in (self.stdColumns or ())):
+                nums = [row.get(key) for row in ok if _isNumber(row.get(key))]
+                avg[key] = mean(nums) if nums else MISSING
+                if self.stdColumns is None or key in self.stdColumns:
+                    avg[key + "_std"] = stddev(nums) if nums else MISSING
+            else:
+                avg[key] = last.get(key)
+        avg["n"] = len(ok)
+        return avg
+
+    def close(self):
+        # incomplete groups (e.g. an interrupted sweep) are still written
+        with self._lock:
+            groups = list(self._groups.values())
+            self._groups = {}
+        for rows in groups:
+            self.writer.writeRow(self._average(rows))
+        if hasattr(self.writer, 'close'):
+            self.writer.close()
@@ -1,8 +1,12 @@
-import sys
-import subprocess
-import csv
 import argparse
 
+from collectlib.catalog import LIGRA_FORMATS, GraphCatalog, displayName, parseSizeClasses, selectGraphs
+from collectlib.extract import Extractor, Metric, registerExtractor
+from collectlib.options import SweepOptions, addArguments
+from collectlib.plan import Plan
+from collectlib.spec import compileSpec, loadSpec
+from collectlib.startvtx import StartVertexCache, generateStartVertices
+
 parser = argparse.ArgumentParser()
 
 parser.add_argument('out_file', action="store", help="The file to which the output is written to")
@@ -12,11 +16,16 @@ parser.add_argument('-all', action="store_true", default=False, dest="all", help
 parser.add_argument('-bfs', action="store_true", default=False, dest="bfs", help="Run BFS")
 parser.add_argument('-sssp', action="store_true", default=False, dest="sssp", help="Run SSSP")
 parser.add_argument('-pr', action="store_true", default=False, dest="pr", help="Run PR")
+addArguments(parser, '-w')
+parser.add_argument('--start-vtx', action="store", type=int, default=None, dest="start_vtx", help="Instead of the listed start vertices, sample this many per graph from the graph file: vertices with edges whose BFS reaches at least --start-vtx-reach vertices")
+parser.add_argument('--start-vtx-reach', action="store", type=int, default=100, dest="start_vtx_reach", help="Vertices a generated start vertex must reach (default 100)")
+parser.add_argument('--start-vtx-cache', action="store", default="start_vtx.json", dest="start_vtx_cache", help="Where generated start vertices are kept per graph file (default start_vtx.json)")
 
 cli = parser.parse_args()
+if cli.spec and (cli.catalog or cli.size_class or cli.start_vtx):
+    parser.error("--catalog, --size-class and --start-vtx only apply to the built-in sweeps; list graph files and start vertices in the spec instead")
 
 TEST_CMD = ["printf", "Running time : 8.27\nhi:hello\nbye:farewell\ngreet:howdy"]
-test_mode = cli.test
 
 def arrToRunPairsWitOpt(arr, opt):
     return [runPair(a, opt + ' ' + str(a)) for a in arr]
@@ -30,121 +39,6 @@ def arrPairToRunPairs(names, cmds):
 def runPair(name, cmd):
     return {"cmd": cmd.split(" "), "name": name}
 
-def makeDataTuple(str_pair):
-    first = str_pair[0]
-    second = str_pair[1]
-    try:
-        second = float(second)
-    except:
-        pass
-    return [first, second]
-
-def pipedPrint(*args):
-    print(*args)
-    sys.stdout.flush()
-
-def blankRes(lines):
-    return {}
-
-def execToLines(cmd, timeout=None, quiet=False):
-    if not quiet:
-        pipedPrint("Executing:", ' '.join(cmd))
-    
-    if test_mode:
-        cmd = TEST_CMD
-
-    try:
-        lines = subprocess.check_output(cmd, timeout=timeout).decode(sys.stdout.encoding).split('\n')
-    except:
-        return None
-    return lines
-
-RUN_ERR_CONTINUE = 1
-RUN_ERR_FAIL = 2
-RUN_ERR_RETRY = 3
-
-def run(config, order, idxMatch={}, subConf={}, extractRes=blankRes, writer=None, timeout=None, quiet=False, errorBehavior=RUN_ERR_CONTINUE):
-    idx = {}
-    for key in order:
-        idx[key] = 0
-    
-    done = False
-    while (not done):
-        # Make command
-        confDict = {}
-        cmd = []
-        for key in order:
-            conf = {}
-            confArr = config[key]
-            if key in subConf:
-                confArr = config[key][config[subConf[key]][idx[subConf[key]]]['name']]
-
-            if key in idxMatch:
-                matchIdx = idx[idxMatch[key]]
-                conf = confArr[matchIdx]
-            else:
-                conf = confArr[idx[key]]
-            
-            if (isinstance(conf, str)):
-                cmd += conf.split(' ')
-            else:
-                cmd += conf['cmd']
-                confDict[key] = conf['name']
-                
-
-        # exec command
-        lines = None
-        while lines == None:
-            lines = execToLines(cmd, timeout=timeout, quiet=quiet)
-            if not lines and errorBehavior == RUN_ERR_CONTINUE:
-                lines=[""]
-        execDict = extractRes(lines)
-
-        resDict = {**confDict, **execDict}
-
-        if writer:
-            writer.writeRow(resDict)
-
-        # next indexes
-        for key in reversed(order):
-            if key in idxMatch:
-                continue
-            num_entries = len(config[key])
-            if key in subConf:
-                num_entries = len(config[key][config[subConf[key]][idx[subConf[key]]]['name']])
-            if (idx[key] < num_entries - 1):
-                idx[key] += 1
-                break
-            else:
-                idx[key] = 0
-                if (key == order[0]):
-                    done = True
-
-class CSVWriter:
-    def __init__(self, outPath, append=False):
-        self.outPath = outPath
-        self.append = append
-        self.writer = None
-        self.outFile = None
-    
-    def _initWriter(self, keys=None):
-        if self.writer:
-            return
-            
-        self.outFile = open(self.outPath, 'a+' if self.append else 'w+')
-        if (keys):
-            self.writer = csv.DictWriter(self.outFile, keys)
-            if not self.append:
-                self.writer.writeheader()
-
-    def writeRows(self, dicts):
-        self._initWriter(dicts[0].keys())
-        self.writer.writerows(dicts)
-        self.outFile.flush()
-
-    def writeRow(self, dict):
-        self.writeRows([dict])
-
 """
 BFS
     graph
@@ -158,15 +52,27 @@ WEIGHTED_SUFFIX = ".w.g"
 UNWEIGHTED_DIR = ""
 WEIGHTED_DIR = ""
 
-GRAPH_NAMES = ["S23-E8", "S25-E8", "S23-E16", "S25-E16", "S23-E32", "Higgs", "Pokec", "StackOverflow", "Skitter", "LiveJournal", "Orkut"]#, "S25-E32", "Twitter"]
 GRAPH_FILES = ["s23_e8", "s25_e8", "s23_e16", "s25_e16", "s23_e32", "higgs-social_network", "soc-pokec-relationships", "sx-stackoverflow", "as-skitter", "soc-LiveJournal1", "com-orkut"]#, "s25_e32", "twitter"]
 
 UNWEIGHTED_GRAPH_FILES = [BASE_GRAPH_PATH + UNWEIGHTED_DIR + g + UNWEIGHTED_SUFFIX for g in GRAPH_FILES]
 WEIGHTED_GRAPH_FILES = [BASE_GRAPH_PATH + WEIGHTED_DIR + g + WEIGHTED_SUFFIX for g in GRAPH_FILES]
 
 
-UNWEIGHTED_GRAPHS = arrPairsToRunPairs([ [GRAPH_NAMES[i], UNWEIGHTED_GRAPH_FILES[i]] for i in range(len(GRAPH_NAMES)) ])
-WEIGHTED_GRAPHS = arrPairsToRunPairs([ [GRAPH_NAMES[i], WEIGHTED_GRAPH_FILES[i]] for i in range(len(GRAPH_NAMES)) ])
+UNWEIGHTED_GRAPHS = [runPair(displayName(f), f) for f in UNWEIGHTED_GRAPH_FILES]
+WEIGHTED_GRAPHS = [runPair(displayName(f), f) for f in WEIGHTED_GRAPH_FILES]
+
+catalog = None
+if cli.catalog:
+    catalog = GraphCatalog(cli.catalog, [BASE_GRAPH_PATH])
+    catalog.refresh()
+    try:
+        sizeClasses = parseSizeClasses(cli.size_class) if cli.size_class else None
+    except ValueError as e:
+        parser.error(str(e))
+    UNWEIGHTED_GRAPHS = selectGraphs(catalog, UNWEIGHTED_GRAPHS, sizeClasses)
+    WEIGHTED_GRAPHS = selectGraphs(catalog, WEIGHTED_GRAPHS, sizeClasses)
+elif cli.size_class:
+    parser.error("--size-class needs --catalog")
 THREADS = arrPairsToRunPairs([[1, '-w 1'], [2, '-w 2'], [4, '-w 4'], [8, '-w 8'], [16, '-w 16']])
 
 ALL_BASE = '-rounds 1'
@@ -207,6 +113,12 @@ SSSP_START_VTX = {
     "Twitter": arrToRunPairsWitOpt([33258104, 28111708, 42057675, 26764230, 33362701, 58768415], '-r'),
 }
 
+if cli.start_vtx:
+    startVtxCache = StartVertexCache(cli.start_vtx_cache)
+    for graphs, table in [(UNWEIGHTED_GRAPHS, BFS_START_VTX), (WEIGHTED_GRAPHS, SSSP_START_VTX)]:
+        generated = generateStartVertices(graphs, cli.start_vtx, startVtxCache, minReach=cli.start_vtx_reach)
+        table.update((name, arrToRunPairsWitOpt(vertices, '-r')) for name, vertices in generated.items())
+
 bfs_config = {
     'graphs': UNWEIGHTED_GRAPHS,
     'app': BFS_APP,
@@ -230,18 +142,24 @@ pr_config = {
     'base': [PR_BASE]
 }
 
-csvWriter = CSVWriter(cli.out_file, cli.append)
+sweep = SweepOptions(cli, parser, TEST_CMD, catalog=catalog, formats=LIGRA_FORMATS)
 
-def extractData(lines):
-    for line in lines:
-        vals = line.strip().split(":")
-        if vals[0].strip() == "Running time":
-            return {'runtime': vals[1].strip()}
-    return {'runtime': '---'}
+extractData = registerExtractor('ligra', Extractor([Metric('Running time', 'runtime', 'float', unit='s')]))
 
+plans = []
 if cli.bfs or cli.all:
-    run(bfs_config, ['app', 'base', 'threads', 'start_vtx', 'graphs'], {}, {'start_vtx': 'graphs'}, extractData, csvWriter)
+    plans.append(Plan(bfs_config, ['app', 'base', 'threads', 'start_vtx', 'graphs'], {}, {'start_vtx': 'graphs'}))
 if cli.sssp or cli.all:
-    run(sssp_config, ['app', 'base', 'threads', 'start_vtx', 'graphs'], {}, {'start_vtx': 'graphs'}, extractData, csvWriter)
+    plans.append(Plan(sssp_config, ['app', 'base', 'threads', 'start_vtx', 'graphs'], {}, {'start_vtx': 'graphs'}))
 if cli.pr or cli.all:
-    run(pr_config, ['app', 'base', 'threads', 'graphs'], {}, {}, extractData, csvWriter)
\ No newline at end of file
+    plans.append(Plan(pr_config, ['app', 'base', 'threads', 'graphs'], {}, {}))
+
+spec = None
+if cli.spec:
+    try:
+        spec = loadSpec(cli.spec)
+        plans = [plan for name, plan in compileSpec(spec)]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        parser.error("Bad spec " + cli.spec + ": " + str(e))
+
+sweep.run(sweep.select(plans, spec), extractData)
@@ -1,7 +1,22 @@
-import sys
-import subprocess
-import csv
+import random
 import argparse
+import threading
+
+from collectlib.cache import CACHED, ResultCache, extractorSignature, fileHash
+from collectlib.catalog import GraphCatalog, displayName, parseSizeClasses
+from collectlib.costmodel import CostModel, TimeoutPolicy
+from collectlib.extract import Extractor, registerExtractor
+from collectlib.fpga import BitstreamScheduler
+from collectlib.noise import ORDER_DEFAULT, ORDER_RANDOM, ORDERS, NumaBind, noiseSettings, pinnedCpus
+from collectlib.perf import PerfStat
+from collectlib.plan import constraintPredicate
+from collectlib.resume import ResumeIndex
+from collectlib.runner import STATUS_ERROR, STATUS_OK, RunResult, Runner, pipedPrint
+from collectlib.spec import loadSpec
+from collectlib.stats import ciConverged, mean, stddev
+from collectlib.store import DURABILITY, DURABILITY_BATCH, ColumnStore
+from collectlib.sweep import MAX_RETRIES, RUN_ERR_RETRY, execConfig
+from collectlib.writer import CSVWriter
 
 parser = argparse.ArgumentParser()
 
@@ -13,87 +28,104 @@ parser.add_argument('-bfs', action="store_true", default=False, help="Execute BF
 parser.add_argument('-sssp', action="store_true", default=False, help="Execute SSSP only")
 parser.add_argument('-pr', action="store_true", default=False, help="Execute PR only")
 parser.add_argument('-pr64', action="store_true", default=False, help="Execute PR only")
+parser.add_argument('-avg', action="store_true", default=False, dest="avg", help="Repeat each run until the 95%% confidence interval of every numeric metric is narrow enough and write mean/std/n columns")
+parser.add_argument('--ci-width', action="store", type=float, default=0.05, dest="ci_width", help="Relative 95%% CI half-width at which -avg stops repeating (default 0.05)")
+parser.add_argument('--min-runs', action="store", type=int, default=3, dest="min_runs", help="Minimum repetitions per run with -avg")
+parser.add_argument('--max-runs', action="store", type=int, default=10, dest="max_runs", help="Maximum repetitions per run with -avg")
+parser.add_argument('--fpgaconf', action="store", default="fpgaconf", dest="fpgaconf", help="Program used to load a bitstream (a stand-in script can be given for testing)")
+parser.add_argument('--fpgaconf-log', action="store", default=None, dest="fpgaconf_log", help="Append the output of every fpgaconf call to this file")
+parser.add_argument('--overlap', action="store_true", default=False, dest="overlap", help="Run CPU configs on a second thread while the FPGA is busy or being reprogrammed; shortens the sweep, but the concurrent runs can disturb each other's timings and rows are no longer written in a fixed order")
+parser.add_argument('--history', action="store", nargs='+', default=None, dest="history", help="Past result CSVs; each run's timeout becomes --timeout-factor times the median of comparable runs, capped at --timeout")
+parser.add_argument('--timeout', action="store", type=float, default=900, dest="timeout", help="Seconds after which a run is killed (its whole process group) and recorded with status timeout (default 900)")
+parser.add_argument('--timeout-factor', action="store", type=float, default=5.0, dest="timeout_factor", help="With --history, a run's timeout is this many times the median wall-clock of comparable past runs (at least 60s)")
+parser.add_argument('--idle-timeout', action="store", type=float, default=None, dest="idle_timeout", help="Kill a run that prints nothing for this many seconds and record it with status stalled")
+parser.add_argument('--retries', action="store", type=int, default=MAX_RETRIES, dest="retries", help="Retry a failed, timed-out or stalled run up to N times with exponential backoff (default %d)" % MAX_RETRIES)
+parser.add_argument('--perf-events', action="store", default=None, dest="perf_events", help="Wrap every run in 'perf stat' and add a column per event, e.g. cycles,instructions,LLC-loads,LLC-load-misses (ipc and llc_miss_rate are derived when both inputs are given); events perf cannot count are left empty")
+parser.add_argument('--cpus', action="store", default=None, dest="cpus", help="Pin runs to these cores (cpulist format, e.g. 0-15,32-47); with --jobs each run gets its own subset")
+parser.add_argument('--numa-node', action="store", type=int, default=None, dest="numa_node", help="Bind run memory to this NUMA node with numactl (and pin to its cores unless --cpus is given)")
+parser.add_argument('--warmups', action="store", type=int, default=0, dest="warmups", help="Discarded warm-up runs before the first run of each (app, graph)")
+parser.add_argument('--order', action="store", choices=ORDERS, default=ORDER_DEFAULT, dest="order", help="Run order: default; interleave (with -avg, repetitions alternate between a graph's FPGA and CPU configs); random (shuffled runs and rounds). interleave and random ignore --overlap")
+parser.add_argument('--seed', action="store", type=int, default=0, dest="seed", help="Seed for --order random, recorded so a campaign can be replayed")
+parser.add_argument('--cache', action="store", default=None, dest="cache", help="Result cache directory: runs whose executable, graph file, bitstream and arguments are unchanged are not executed again; a cached column marks their rows with 1")
+parser.add_argument('--cache-refresh', action="store_true", default=False, dest="cache_refresh", help="Ignore cached results (but store the new ones)")
+parser.add_argument('--cache-max-age', action="store", type=float, default=None, dest="cache_max_age", help="After the sweep, drop cache entries older than this many days")
+parser.add_argument('--cache-max-mb', action="store", type=float, default=None, dest="cache_max_mb", help="After the sweep, drop the oldest cache entries until the cache fits in this many MB")
+parser.add_argument('--store', action="store", default=None, dest="store", help="Also append results to this columnar store directory (typed segments, see 'results.py export')")
+parser.add_argument('--store-durability', action="store", choices=DURABILITY, default=DURABILITY_BATCH, dest="store_durability", help="When store segments are written: on exit, every batch of rows (default) or every batch plus fsync")
+parser.add_argument('--catalog', action="store", default=None, dest="catalog", help="Graph catalog index file (created if missing): graphs are looked up by name under the graph directory, and with --history their sizes let the cost model predict graphs that have no history")
+parser.add_argument('--size-class', action="store", default=None, dest="size_class", help="With --catalog, only run graphs of these size classes (comma-separated: small up to 1 GB, medium up to 8 GB, large)")
+parser.add_argument('--spec', action="store", default=None, dest="spec", help="Spec file (.json or .toml): its exclude/include constraints over app, graph and processor drop runs, and its apps (name, graph_path, graphs, suffix, options, bitstream) replace the built-in ones and the app flags")
+parser.add_argument('--resume', action="store_true", default=False, dest="resume", help="Append to outfile and only run (app, graph, processor) combinations that have no ok row in it yet (failed ones run again)")
 
 cli = parser.parse_args()
 
 TEST_CMD = ["printf", "hi:hello\nbye:farewell\ngreet:howdy"]
-test_mode = cli.t
+test_mode = cli.test
+perfStat = PerfStat(cli.perf_events.split(',')) if cli.perf_events else None
+membind = NumaBind(cli.numa_node) if cli.numa_node is not None else None
+try:
+    pinned = pinnedCpus(cli.cpus, cli.numa_node)
+except ValueError as e:
+    parser.error(str(e))
+runner = Runner(TEST_CMD if test_mode else None, perfStat, membind)
 
-def pipedPrint(*args):
-    print(*args)
-    sys.stdout.flush()
-
-def makeDataTuple(str_pair):
-    first = str_pair[0]
-    second = str_pair[1]
-    try:
-        second = float(second)
-    except:
-        pass
-    return [first, second]
-
-def exec(cmd, timeout=60, quiet=False):
-    if not quiet:
-        pipedPrint("Executing:", ' '.join(cmd))
-    
-    if test_mode:
-        cmd = TEST_CMD
-
-    try:
-        subprocess.check_output(cmd, timeout=timeout)
-    except subprocess.TimeoutExpired:
-        return False
-    return True
-
-def execToDict(cmd, timeout=60, quiet=False):
-    if not quiet:
-        pipedPrint("Executing:", ' '.join(cmd))
-    
-    if test_mode:
-        cmd = TEST_CMD
-
-    try:
-        lines = subprocess.check_output(cmd, timeout=timeout).decode(sys.stdout.encoding).split('\n')
-    except subprocess.TimeoutExpired:
-        return None
-    
-    return dict(makeDataTuple(line.strip().split(":")) for line in lines if line!='')
-
-def cleanGraphName(graph):
-    if graph[0] == 'd':
-        return graph[2:9]
-    else:
-        return graph.split("_")[0]
+dictExtractor = registerExtractor('graph_collect', Extractor([], captureAll=True))
 
 class Config:
-    def __init__(self, options, info):
+    def __init__(self, options, info, fpga=False):
         self.options = options
         self.info = info
-
-class CSVWriter:
-    def __init__(self, outPath, append=False):
-        self.outPath = outPath
-        self.append = append
-        self.writer = None
-        self.outFile = None
-    
-    def _initWriter(self, keys):
-        if self.writer:
+        self.fpga = fpga
+
+class AvgSeries:
+    """The repetitions of one (graph, config) and the averaged row they make."""
+    def __init__(self, labels, cmd):
+        self.labels = labels
+        self.cmd = cmd
+        self.samples = {}
+        self.other = {}
+        self.walls = []
+        self.usage = {}
+        self.n = 0
+        self.status = None
+        self.failed = False
+
+    def add(self, resultDict, res):
+        self.status = res.status
+        if not res.ok:
+            # a repetition that failed even after retries ends the series
+            self.failed = True
             return
-            
-        self.outFile = open(self.outPath, 'a+' if self.append else 'w+')
-        self.writer = csv.DictWriter(self.outFile, keys)
-        
-        if not self.append:
-            self.writer.writeheader()
-
-    def writeRows(self, dicts):
-        self._initWriter(dicts[0].keys())
-        self.writer.writerows(dicts)
-        self.outFile.flush()
-
-    def writeRow(self, dict):
-        self.writeRows([dict])
+        self.n += 1
+        self.walls.append(res.wall)
+        for key, val in {**res.usage, **res.counters}.items():
+            if isinstance(val, (int, float)):
+                self.usage.setdefault(key, []).append(val)
+        for key, val in resultDict.items():
+            if isinstance(val, float):
+                self.samples.setdefault(key, []).append(val)
+            else:
+                self.other[key] = val
+
+    def done(self, relWidth, minRuns, maxRuns):
+        if self.failed or self.n >= maxRuns:
+            return True
+        return self.n >= minRuns and all(ciConverged(vals, relWidth) for vals in self.samples.values())
+
+    def row(self):
+        avgDict = {"n": self.n}
+        for key, vals in self.samples.items():
+            avgDict[key + "_mean"] = mean(vals)
+            avgDict[key + "_std"] = stddev(vals)
+            avgDict[key + "_n"] = len(vals)
+        avgDict["wall_s_mean"] = round(mean(self.walls), 3) if self.walls else "---"
+        for key, vals in self.usage.items():
+            avgDict[key + "_mean"] = round(mean(vals), 3)
+        # peak memory is what matters for sizing, not its average
+        if "maxrss_kb" in self.usage:
+            avgDict["maxrss_kb_max"] = max(self.usage["maxrss_kb"])
+        avgDict["status"] = self.status
+        return {**self.labels, **self.other, **avgDict}
 
 class RunCollect:
     def __init__(self, app, graphPath, graphs, baseOptions=[]):
@@ -105,6 +137,21 @@ class RunCollect:
         self._runDicts = []
         self._dict_prune = None
         self.writer = None
+        self._store = None
+        self._resume = None
+        self._timeouts = None
+        self.retries = MAX_RETRIES
+        self._cpus = None
+        self._warmups = 0
+        self._warmed = set()
+        self._warmLock = threading.Lock()
+        self._settings = {}
+        self.order = ORDER_DEFAULT
+        self.seed = 0
+        self._rng = random.Random(0)
+        self._cache = None
+        self._bitstream = None
+        self._constraints = None
     
     def addConfig(self, config):
         self.configs.append(config)
@@ -112,64 +159,191 @@ class RunCollect:
     def addConfigs(self, configs):
         self.configs += configs
 
+    # Runs cmd, retrying a failed run up to self.retries times with
+    # exponential backoff; returns the (pruned) result dict and the RunResult.
+    def _execResult(self, cmd, labels, timeout, quiet):
+        idle = None
+        if self._timeouts:
+            timeout, idle = self._timeouts.timeout(labels), self._timeouts.idle
+        row, res = execConfig(runner, cmd, labels, dictExtractor, timeout, quiet, RUN_ERR_RETRY, self._cpus, idle, self.retries)
+        resultDict = res.data
+        if self._dict_prune:
+            self._dict_prune(resultDict)
+        return resultDict, res
+
+    # Discarded runs before the first measured run of a graph
+    def _warmUp(self, exec, graph, config, timeout, quiet):
+        with self._warmLock:
+            if graph in self._warmed:
+                return
+            self._warmed.add(graph)
+        for i in range(self._warmups):
+            if not quiet:
+                pipedPrint("\tWarm-up %d/%d, result discarded" % (i + 1, self._warmups))
+            runner.execStream(self._cmd(exec, graph, config), dictExtractor, timeout=timeout, quiet=quiet, cpus=self._cpus)
+
+    def _record(self, runDict, cached=False):
+        runDict = {**runDict, **self._settings}
+        if self._cache:
+            runDict[CACHED] = 1 if cached else 0
+        if self.writer:
+            self.writer.writeRow(runDict)
+
+        if self._store:
+            self._store.writeRow(runDict)
+        else:
+            self._runDicts.append(runDict)
+
+    def _labels(self, graph):
+        runDict = {}
+        runDict["app"] = self.app
+        runDict["graph"] = displayName(graph)
+        return runDict
+
+    def _cmd(self, exec, graph, config):
+        return [exec, self.graphPath + graph] + self.baseOptions + config.options
+
+    def pendingRuns(self):
+        runs = [(graph, config) for graph in self.graphs for config in self.configs
+                if not self._isDone(self._labels(graph), config) and self._allowed(graph, config)]
+        if self.order == ORDER_RANDOM:
+            random.Random(self.seed).shuffle(runs)
+        return iter(runs)
+
+    def _cacheKey(self, cmd, config, extra=None):
+        context = {**runner.context(), "cpus": sorted(self._cpus) if self._cpus else None, **(extra or {})}
+        if config.fpga and self._bitstream:
+            context["bitstream"] = fileHash(self._bitstream)
+        if self._dict_prune:
+            context["prune"] = extractorSignature(self._dict_prune)
+        return self._cache.key(cmd, dictExtractor, context)
+
+    def _cached(self, key, cmd, quiet):
+        res = self._cache.get(key) if key else None
+        if res and not quiet:
+            pipedPrint("Cached:", ' '.join(cmd))
+        return res
+
+    def runOne(self, exec, graph, config, timeout=60, quiet=False):
+        labels = {**self._labels(graph), **config.info}
+        cmd = self._cmd(exec, graph, config)
+        key = self._cacheKey(cmd, config) if self._cache else None
+        res = self._cached(key, cmd, quiet)
+        if res:
+            resultDict = res.data
+        else:
+            self._warmUp(exec, graph, config, timeout, quiet)
+            resultDict, res = self._execResult(cmd, labels, timeout, quiet)
+            if key:
+                self._cache.put(key, res, cmd)
+        self._record({**labels, **resultDict, "wall_s": round(res.wall, 3) if res.wall is not None else "---", **res.usage, **res.counters, "status": res.status}, res.cached)
+
+    # Repeats a run until the 95% CI of every numeric metric is within
+    # relWidth of its mean (or maxRuns is hit) and records mean/std/n.
+    def runAvgOne(self, exec, graph, config, relWidth=0.05, minRuns=3, maxRuns=10, timeout=60, quiet=False):
+        self.runAvgGroup(exec, graph, [config], relWidth, minRuns, maxRuns, timeout, quiet)
+
+    # Like runAvgOne for several configs of one graph, but in rounds of one
+    # repetition per unfinished config, so drift during the series affects
+    # every config (FPGA and CPU) alike; with order random each round is
+    # shuffled.
+    def runAvgGroup(self, exec, graph, configs, relWidth=0.05, minRuns=3, maxRuns=10, timeout=60, quiet=False):
+        series = [AvgSeries({**self._labels(graph), **config.info}, self._cmd(exec, graph, config)) for config in configs]
+        # a whole averaged series is cached, keyed with its stopping rule
+        keys = [self._cacheKey(s.cmd, config, {"avg": [relWidth, minRuns, maxRuns]}) if self._cache else None
+                for s, config in zip(series, configs)]
+        cachedRows = {}
+        for s, key in zip(series, keys):
+            res = self._cached(key, s.cmd, quiet)
+            if res:
+                cachedRows[id(s)] = res.data
+        active = [s for s in series if id(s) not in cachedRows]
+        if active:
+            self._warmUp(exec, graph, configs[series.index(active[0])], timeout, quiet)
+        while active:
+            if self.order == ORDER_RANDOM:
+                self._rng.shuffle(active)
+            for s in active:
+                resultDict, res = self._execResult(s.cmd, s.labels, timeout, quiet)
+                s.add(resultDict, res)
+            active = [s for s in active if not s.done(relWidth, minRuns, maxRuns)]
+
+        for s, key in zip(series, keys):
+            row = cachedRows.get(id(s))
+            if row is None:
+                row = s.row()
+                if key and not s.failed:
+                    self._cache.put(key, RunResult(STATUS_OK, row), s.cmd)
+            self._record(row, id(s) in cachedRows)
+
+    # A run that could not be made (e.g. its bitstream failed to program)
+    # still gets a row, shaped like a failed run's, so it shows up and is
+    # run again on resume.
+    def skip(self, graph, config, status, avg=False):
+        labels = {**self._labels(graph), **config.info}
+        if avg:
+            series = AvgSeries(labels, None)
+            series.status = status
+            self._record(series.row())
+        else:
+            self._record({**labels, "wall_s": "---", "status": status})
+
     def run(self, exec, timeout=60, quiet=False):
-        for graph in self.graphs:
-            for config in self.configs:
-                cmd  = [exec, self.graphPath + graph] + self.baseOptions + config.options
-                
-                runDict = {}
-                runDict["app"] = self.app
-                runDict["graph"] = cleanGraphName(graph)
-                
-                resultDict = None
-                while resultDict == None:
-                    resultDict = execToDict(cmd, timeout=timeout, quiet=quiet)
-                    if not resultDict and not quiet:
-                        pipedPrint("\tTimed-out, retrying...")
-
-                if self._dict_prune:
-                    self._dict_prune(resultDict)
-
-                runDict = {**runDict, **config.info, **resultDict}
-
-                if self.writer:
-                    self.writer.writeRow(runDict)
-
-                self._runDicts.append(runDict)
-    
-    def runAvg(self, exec, avgOpts, avgVal, timeout=60, quiet=False):
-        for graph in self.graphs:
-            for config in self.configs:
-                cmd  = [exec] + self.baseOptions + config.options + [self.graphPath + graph]
-                
-                runDict = {}
-                runDict["app"] = self.app
-                runDict["graph"] = cleanGraphName(graph)
-                
-                resultDict = None
-                while resultDict == None:
-                    resultDict = execToDict(cmd, timeout=timeout, quiet=quiet)
-                    if not resultDict and not quiet:
-                        pipedPrint("\tTimed-out, retrying...")
-
-                if self._dict_prune:
-                    self._dict_prune(resultDict)
-
-                runDict = {**runDict, **config.info, **resultDict}
-
-                if self.writer:
-                    self.writer.writeRow(runDict)
-
-                self._runDicts.append(runDict)
+        for graph, config in self.pendingRuns():
+            self.runOne(exec, graph, config, timeout, quiet)
+
+    def runAvg(self, exec, relWidth=0.05, minRuns=3, maxRuns=10, timeout=60, quiet=False):
+        for graph, config in self.pendingRuns():
+            self.runAvgOne(exec, graph, config, relWidth, minRuns, maxRuns, timeout, quiet)
 
     def setWriter(self, writer):
         self.writer = writer
 
+    # With a store, results are not kept in memory and getResults() streams
+    # this app's rows back from its segments instead.
+    def setStore(self, storeWriter):
+        self._store = storeWriter
+
+    # cpus pins every run, warmups discarded runs precede each graph's first
+    # run, order is one of ORDERS; settings are added to every row.
+    def setNoise(self, cpus=None, warmups=0, order=ORDER_DEFAULT, seed=0, settings=None):
+        self._cpus = cpus
+        self._warmups = warmups
+        self.order = order
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._settings = settings or {}
+
+    # bitstream is hashed into the cache key of FPGA configs
+    def setCache(self, cache, bitstream=None):
+        self._cache = cache
+        self._bitstream = bitstream
+
+    def setTimeoutPolicy(self, policy, retries=MAX_RETRIES):
+        self._timeouts = policy
+        self.retries = retries
+
+    # A spec's exclude/include constraints over app, graph and processor
+    def setConstraints(self, pred):
+        self._constraints = pred
+
+    def _allowed(self, graph, config):
+        return self._constraints is None or self._constraints({**self._labels(graph), **config.info})
+
+    def setResume(self, resume):
+        self._resume = resume
+
+    def _isDone(self, runDict, config):
+        return self._resume is not None and self._resume.isDone({**runDict, **config.info})
+
     def setResultPruneFn(self, fn):
         self._dict_prune = fn
 
     #order results for prop
     def getResults(self):
+        if self._store:
+            self._store.flush()
+            return self._store.store.scan(where={"app": self.app})
         return self._runDicts
 
 
@@ -181,7 +355,7 @@ PR_GRAPH_PATH = BASE_GRAPH_PATH + "/pr32/"
 PR64_GRAPH_PATH = BASE_GRAPH_PATH + "/pr64/"
 
 BASE_OPTIONS = ["-b", "-q", "-script", "-colbw", "-gt", "16", "-automemo", "-nox2u"]
-FPGA_CONFIG = Config(BASE_OPTIONS + [ "-fpga" ], {"processor": "fpga"})
+FPGA_CONFIG = Config(BASE_OPTIONS + [ "-fpga" ], {"processor": "fpga"}, fpga=True)
 CPU_CONFIG = Config(BASE_OPTIONS + [ "-cpu" ], {"processor": "cpu"})
 
 # BFS_GRAPHS = ["d_s23_e32_bfs.b", "d_s24_e32_bfs.b", "d_s25_e32_bfs.b", "as-skitter_bfs.b", "soc-LiveJournal1_bfs.b", "twitter_bfs.b"]
@@ -202,41 +376,97 @@ SSSP_BITSTREAM = "/homes/obrienfr/bitstreams/sssp/ws_sssp_dedup_286.gbs"
 PR_BITSTREAM = "/homes/obrienfr/bitstreams/pr/ws_pr32_dedup_235.gbs"
 PR64_BITSTREAM = "/homes/obrienfr/bitstreams/pr64/ws_pr64_dedup_239.gbs"
 
-csvWriter = CSVWriter(cli.out_file, cli.append)
-
-BFS_GRAPHS = [s + BFS_SUFFIX for s in GRAPHS]
-bfs_run = RunCollect("bfs", BFS_GRAPH_PATH, BFS_GRAPHS, ["-bfs"])
-bfs_run.addConfigs([FPGA_CONFIG, CPU_CONFIG])
-bfs_run.setWriter(csvWriter)
-
-SSSP_GRAPHS = [s + SSSP_SUFFIX for s in GRAPHS]
-sssp_run = RunCollect("sssp", SSSP_GRAPH_PATH, SSSP_GRAPHS, ["-sssp"])
-sssp_run.addConfigs([FPGA_CONFIG, CPU_CONFIG])
-sssp_run.setWriter(csvWriter)
-
-PR_GRAPHS = [s + PR_SUFFIX for s in GRAPHS]
-pr_run = RunCollect("pr32", PR_GRAPH_PATH, PR_GRAPHS, ["-pr32"])
-pr_run.addConfigs([FPGA_CONFIG, CPU_CONFIG])
-pr_run.setWriter(csvWriter)
-
-PR64_GRAPHS = [s + PR64_SUFFIX for s in GRAPHS]
-pr64_run = RunCollect("pr64", PR64_GRAPH_PATH, PR64_GRAPHS, ["-pr"])
-pr64_run.addConfigs([FPGA_CONFIG, CPU_CONFIG])
-pr64_run.setWriter(csvWriter)
-
-if cli.bfs or cli.all:
-    exec(["fpgaconf", BFS_BITSTREAM])
-    bfs_run.run("./graph_analytics", timeout=900)
-
-if cli.sssp or cli.all:
-    exec(["fpgaconf", SSSP_BITSTREAM])
-    sssp_run.run("./graph_analytics", timeout=900)
-
-if cli.pr or cli.all:
-    exec(["fpgaconf", PR_BITSTREAM])
-    pr_run.run("./graph_analytics", timeout=900)
-
-if cli.pr64 or cli.all:
-    exec(["fpgaconf", PR64_BITSTREAM])
-    pr64_run.run("./graph_analytics", timeout=900)
-
+resume = ResumeIndex(cli.out_file) if cli.resume else None
+csvWriter = CSVWriter(cli.out_file, cli.append or cli.resume)
+costModel = CostModel.fromFiles(cli.history) if cli.history else None
+timeoutPolicy = TimeoutPolicy(costModel, cli.timeout_factor, ceiling=cli.timeout, idle=cli.idle_timeout)
+settings = noiseSettings(pinned, membind, cli.warmups, cli.order)
+if cli.order != ORDER_DEFAULT:
+    settings["seed"] = cli.seed
+cache = ResultCache(cli.cache, cli.cache_refresh) if cli.cache else None
+storeWriter = ColumnStore(cli.store).writer(durability=cli.store_durability) if cli.store else None
+
+catalog = None
+if cli.catalog:
+    catalog = GraphCatalog(cli.catalog, [BASE_GRAPH_PATH])
+    catalog.refresh()
+    if costModel:
+        costModel.setSizes(catalog.sizes())
+elif cli.size_class:
+    parser.error("--size-class needs --catalog")
+try:
+    sizeClasses = parseSizeClasses(cli.size_class) if cli.size_class else None
+except ValueError as e:
+    parser.error(str(e))
+
+def catalogGraphs(graphPath, graphs):
+    if not sizeClasses:
+        return graphs
+    entries = [catalog.lookup(graphPath + g) for g in graphs]
+    return [g for g, e in zip(graphs, entries) if e and e["size_class"] in sizeClasses]
+
+def makeRunCollect(app, graphPath, graphs, options, bitstream):
+    runCollect = RunCollect(app, graphPath, catalogGraphs(graphPath, graphs), options)
+    runCollect.addConfigs([FPGA_CONFIG, CPU_CONFIG])
+    runCollect.setWriter(csvWriter)
+    runCollect.setStore(storeWriter)
+    runCollect.setResume(resume)
+    runCollect.setTimeoutPolicy(timeoutPolicy, cli.retries)
+    runCollect.setNoise(pinned, cli.warmups, cli.order, cli.seed, settings)
+    runCollect.setCache(cache, bitstream)
+    runCollect.setConstraints(constraints)
+    return runCollect
+
+spec = None
+constraints = None
+if cli.spec:
+    try:
+        spec = loadSpec(cli.spec)
+        constraints = constraintPredicate(spec.get("exclude"), spec.get("include"))
+    except (OSError, ValueError, TypeError) as e:
+        parser.error("Bad spec " + cli.spec + ": " + str(e))
+
+bfs_run = makeRunCollect("bfs", BFS_GRAPH_PATH, [s + BFS_SUFFIX for s in GRAPHS], ["-bfs"], BFS_BITSTREAM)
+sssp_run = makeRunCollect("sssp", SSSP_GRAPH_PATH, [s + SSSP_SUFFIX for s in GRAPHS], ["-sssp"], SSSP_BITSTREAM)
+pr_run = makeRunCollect("pr32", PR_GRAPH_PATH, [s + PR_SUFFIX for s in GRAPHS], ["-pr32"], PR_BITSTREAM)
+pr64_run = makeRunCollect("pr64", PR64_GRAPH_PATH, [s + PR64_SUFFIX for s in GRAPHS], ["-pr"], PR64_BITSTREAM)
+
+# a spec's apps replace the built-in ones and the app flags
+specRuns = []
+if spec and "apps" in spec:
+    try:
+        for app in spec["apps"]:
+            specRuns.append((makeRunCollect(app["name"], app["graph_path"], [f + app.get("suffix", "") for f in app["graphs"]],
+                                            app.get("options", []), app["bitstream"]), app["bitstream"]))
+    except (KeyError, TypeError) as e:
+        parser.error("Bad spec " + cli.spec + ": app needs name, graph_path, graphs and bitstream (" + str(e) + ")")
+
+def runJob(runCollect, graph, config):
+    if cli.avg:
+        runCollect.runAvgOne("./graph_analytics", graph, config, cli.ci_width, cli.min_runs, cli.max_runs, timeout=cli.timeout)
+    else:
+        runCollect.runOne("./graph_analytics", graph, config, timeout=cli.timeout)
+
+def runGroup(runCollect, graph, configs):
+    runCollect.runAvgGroup("./graph_analytics", graph, configs, cli.ci_width, cli.min_runs, cli.max_runs, timeout=cli.timeout)
+
+def skipJob(runCollect, graph, config):
+    runCollect.skip(graph, config, STATUS_ERROR, cli.avg)
+
+# overlapping would run FPGA and CPU configs on separate threads, defeating a chosen order
+scheduler = BitstreamScheduler(cli.fpgaconf, overlap=cli.overlap and cli.order == ORDER_DEFAULT, log=cli.fpgaconf_log)
+
+runs = specRuns or [(runCollect, bitstream) for selected, runCollect, bitstream in [
+    (cli.bfs, bfs_run, BFS_BITSTREAM), (cli.sssp, sssp_run, SSSP_BITSTREAM),
+    (cli.pr, pr_run, PR_BITSTREAM), (cli.pr64, pr64_run, PR64_BITSTREAM)] if selected or cli.all]
+for runCollect, bitstream in runs:
+    scheduler.add(runCollect, bitstream)
+
+scheduler.run(runJob, runGroup if cli.avg and cli.order != ORDER_DEFAULT else None, skipJob)
+csvWriter.close()
+if storeWriter:
+    storeWriter.close()
+scheduler.report()
+if cache:
+    cache.evict(cli.cache_max_age * 86400 if cli.cache_max_age else None, cli.cache_max_mb * 1e6 if cli.cache_max_mb else None)
+    cache.report()
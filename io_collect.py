@@ -1,45 +1,65 @@
-import os 
-import sys
-
-if len(sys.argv) < 2:
-    print('No outfile')
-    quit()
-
-out_file = sys.argv[1]
-cli_app = ''
- 
-if len(sys.argv) >= 3:
-    cli_app = sys.argv[2] if sys.argv[2] != '-t' else ''
-
-test_en = False
-for arg in sys.argv:
-    if arg == '-t':
-        test_en = True
-
-def runCommand(command):
-    if test_en:
-        print(command)
-    else:
-        os.system(command)
-
-col_op = {
-    '': 'tot',
-    '-dr': 'wr',
-    '-dw': 'rd'
+import os
+import argparse
+
+from collectlib.extract import Extractor, Metric, registerExtractor
+from collectlib.plan import Plan
+from collectlib.runner import Runner, pipedPrint
+from collectlib.sweep import runPlan
+from collectlib.writer import AveragingWriter, CSVWriter
+
+parser = argparse.ArgumentParser()
+
+parser.add_argument('out_file', action="store", help="The file to which the output is written to")
+parser.add_argument('app', action="store", nargs='?', default='./interface_debug', help="The interface benchmark to run (default ./interface_debug)")
+parser.add_argument('-t', action="store_true", default=False, dest="test", help="Enable test mode; real function printed to console and dummy function is executed, output is filled with dummy output plus config")
+parser.add_argument('-a', action="store_true", default=False, dest="append", help="Append to outfile rather than overwriting")
+parser.add_argument('--scale-low', action="store", type=int, default=15, dest="scale_low", help="Smallest -d scale to run (default 15)")
+parser.add_argument('--scale-high', action="store", type=int, default=24, dest="scale_high", help="Largest -d scale to run (default 24)")
+parser.add_argument('--ops', action="store", default="tot,wr,rd", dest="ops", help="Comma-separated subset of tot,wr,rd to measure")
+parser.add_argument('--jobs', action="store", type=int, default=1, dest="jobs", help="Run up to N scale points at once")
+parser.add_argument('--reps', action="store", type=int, default=1, dest="reps", help="Run every point N times and write the mean (and _std) of each numeric column")
+
+cli = parser.parse_args()
+
+TEST_CMD = ["printf", "Tot BW: 1234.5\nWr BW: 610.25\nRd BW: 624.25\n"]
+runner = Runner(TEST_CMD if cli.test else None)
+
+# op name -> (extra option, output line whose third field is the value);
+# -dr disables reads, so it measures writes, and -dw the other way round
+OPS = {
+    'tot': ([], 'Tot'),
+    'wr': (['-dr'], 'Wr'),
+    'rd': (['-dw'], 'Rd'),
 }
 
-def collectData(app, op_list, extract, optionalArgs = []):
-    for op in op_list:
-            optional = ' '.join(optionalArgs)
-            print(f'Running {app} with {op} and {optional} ...')
-
-            runCommand(f'{app} -d {op} {optional} > tmp_out')
-            runCommand(f'awk \'$1 == "{extract}" {{print $3}}\' tmp_out > tmp_out2')
-            runCommand(f'echo -n "{col_op[optional]},{op}," | cat - tmp_out2 >> {out_file}')
-
-scale_low = 15
-scale_high = 24
-app_command = './interface_debug'
-collectData(app_command, [i for i in range(scale_low, scale_high+1)], 'Tot' , [''])
-collectData(app_command, [i for i in range(scale_low, scale_high+1)], 'Wr' , ['-dr'])
-collectData(app_command, [i for i in range(scale_low, scale_high+1)], 'Rd' , ['-dw'])
+ops = [op.strip() for op in cli.ops.split(',') if op.strip()]
+unknown = [op for op in ops if op not in OPS]
+if unknown:
+    parser.error("Unknown op(s): " + ', '.join(unknown))
+if cli.scale_low > cli.scale_high:
+    parser.error("--scale-low must not be above --scale-high")
+
+# interface_debug takes no thread count, so with --jobs each run is pinned
+# to an equal share of the cores rather than to one
+def ioCores(cmd):
+    return max(1, len(os.sched_getaffinity(0)) // cli.jobs)
+
+order = ['exec', 'scale', 'op'] + (['rep'] if cli.reps > 1 else [])
+csvWriter = CSVWriter(cli.out_file, cli.append)
+writer = AveragingWriter(csvWriter, order, cli.reps, stdColumns=['value']) if cli.reps > 1 else csvWriter
+
+for op in ops:
+    option, key = OPS[op]
+    config = {
+        'exec': [cli.app],
+        'scale': [{'name': scale, 'cmd': ['-d', str(scale)]} for scale in range(cli.scale_low, cli.scale_high + 1)],
+        'op': [{'name': op, 'cmd': option}],
+    }
+    if cli.reps > 1:
+        config['rep'] = [{'name': rep, 'cmd': []} for rep in range(cli.reps)]
+    # awk '$1 == "Tot" {print $3}'
+    extractor = registerExtractor('interface_' + op, Extractor([Metric(key, 'value', 'float', field=2)], sep=None))
+    pipedPrint("Running", cli.app, "with", op, "...")
+    runPlan(Plan(config, order), extractor, writer, runner=runner, jobs=cli.jobs, coresFn=ioCores)
+
+writer.close()
@@ -0,0 +1,169 @@
+import os
+import sys
+import csv
+import argparse
+
+from collectlib import analyze, compare
+from collectlib.archive import OutputArchive, reextract
+from collectlib.extract import Metric
+from collectlib.runner import pipedPrint
+from collectlib.shard import mergeCsvs
+from collectlib.store import ColumnStore
+from collectlib.writer import UnionCSVWriter
+
+def whereSpec(spec):
+    key, sep, val = spec.partition('=')
+    if not sep or not key.strip():
+        raise argparse.ArgumentTypeError("must look like label=value: " + spec)
+    return key.strip(), val
+
+# --where as export and reextract take it
+whereParser = argparse.ArgumentParser(add_help=False)
+whereParser.add_argument('--where', action="append", type=whereSpec, default=None, dest="where", help="Only rows with this label value, e.g. --where app=bfs (repeat for several labels)")
+
+parser = argparse.ArgumentParser(description="Tools for result CSVs written by the collectors")
+commands = parser.add_subparsers(dest="command")
+commands.required = True
+
+mergeParser = commands.add_parser('merge', help="Combine shard result files into one, in canonical config order")
+mergeParser.add_argument('in_files', action="store", nargs='+', help="Shard result files")
+mergeParser.add_argument('-o', action="store", required=True, dest="out_file", help="The merged file")
+
+importParser = commands.add_parser('import', help="Append result CSVs to a columnar store")
+importParser.add_argument('store', action="store", help="Store directory")
+importParser.add_argument('in_files', action="store", nargs='+', help="Result CSVs")
+
+exportParser = commands.add_parser('export', parents=[whereParser], help="Write a columnar store back out as one CSV")
+exportParser.add_argument('store', action="store", help="Store directory")
+exportParser.add_argument('-o', action="store", required=True, dest="out_file", help="The CSV to write")
+
+analyzeParser = commands.add_parser('analyze', help="Summarize result CSVs or stores: start-vertex means, speedups, thread scaling")
+analyzeParser.add_argument('in_files', action="store", nargs='+', help="Result CSVs and/or store directories")
+analyzeParser.add_argument('--metric', action="store", default=None, dest="metric", help="Time column to analyze (default runtime, else wall_s)")
+analyzeParser.add_argument('--by', action="store", default=None, dest="by", help="Comma-separated label columns identifying a config (default: the known labels present)")
+analyzeParser.add_argument('--report', action="append", choices=['vertices', 'speedup', 'efficiency'], default=None, dest="report", help="Tables to produce (default: every one the columns allow)")
+analyzeParser.add_argument('--baseline', action="store", default="cpu", dest="baseline", help="processor value speedups are relative to (default cpu)")
+analyzeParser.add_argument('--target', action="store", default="fpga", dest="target", help="processor value whose speedup is reported (default fpga)")
+analyzeParser.add_argument('-o', action="store", default=None, dest="out_dir", help="Write each table as <name>.csv in this directory instead of printing")
+
+compareParser = commands.add_parser('compare', help="Compare new results with a baseline per config; exits 1 on regressions, 2 when too few configs could be tested")
+compareParser.add_argument('--baseline', action="store", nargs='+', required=True, dest="baseline", help="Baseline result CSVs and/or store directories; the runs of every file are pooled per config, so give several campaigns")
+compareParser.add_argument('--new', action="store", nargs='+', required=True, dest="new", help="New result CSVs and/or store directories, pooled the same way")
+compareParser.add_argument('--metric', action="store", default=None, dest="metric", help="Column to compare (default runtime, else wall_s)")
+compareParser.add_argument('--by', action="store", default=None, dest="by", help="Comma-separated label columns identifying a config (default: the known labels both sets have)")
+compareParser.add_argument('--higher-is-better', action="store_true", default=False, dest="higher_is_better", help="The metric is a rate (e.g. bandwidth) rather than a time")
+compareParser.add_argument('--alpha', action="store", type=float, default=0.05, dest="alpha", help="Significance level of the Mann-Whitney test (default 0.05)")
+compareParser.add_argument('--threshold', action="store", type=float, default=0.05, dest="threshold", help="Smallest relative change that counts (default 0.05)")
+compareParser.add_argument('--max-regressions', action="store", type=int, default=0, dest="max_regressions", help="Exit 1 when more configs than this regress (default 0)")
+compareParser.add_argument('--max-untested', action="store", type=float, default=0.5, dest="max_untested", help="Exit 2 when more than this fraction of configs has fewer than two runs on a side and so cannot be tested (default 0.5)")
+compareParser.add_argument('--all', action="store_true", default=False, dest="all", help="List every config, not only regressions and improvements")
+compareParser.add_argument('-o', action="store", default=None, dest="out_dir", help="Write compare.csv and compare_apps.csv to this directory instead of printing")
+
+reextractParser = commands.add_parser('reextract', parents=[whereParser], help="Write the rows of archived runs (a collector's --archive) again, extracting values from their archived output")
+reextractParser.add_argument('archive', action="store", help="Archive directory")
+reextractParser.add_argument('-o', action="store", required=True, dest="out_file", help="The result CSV to write")
+reextractParser.add_argument('--metric', action="append", default=None, dest="metric", help="Value to extract, name[:type[:agg[:column]]] as printed by the binary, e.g. --metric MIN_EDG_CLs:int:last; replaces each run's own metrics unless --keep-metrics")
+reextractParser.add_argument('--keep-metrics', action="store_true", default=False, dest="keep_metrics", help="Extract each run's original metrics as well as the --metric ones")
+reextractParser.add_argument('--capture-all', action="store_true", default=False, dest="capture_all", help="Also add a column for every other 'key: value' line of the output")
+reextractParser.add_argument('--jobs', action="store", type=int, default=None, dest="jobs", help="Worker processes (default: one per core)")
+
+cli = parser.parse_args()
+
+def outputTables(tables, outDir):
+    for name, rows in tables:
+        if outDir:
+            os.makedirs(outDir, exist_ok=True)
+            path = os.path.join(outDir, name + '.csv')
+            pipedPrint("Wrote", analyze.writeTable(rows, path=path), "rows to", path)
+        else:
+            pipedPrint("\n== " + name + " ==")
+            analyze.writeTable(rows)
+
+def exportStore(store, outPath, where=None):
+    header = []
+    for segment in store.segments():
+        for name in segment.columnNames():
+            if name not in header:
+                header.append(name)
+    count = 0
+    with open(outPath, 'w', newline='') as outFile:
+        writer = csv.DictWriter(outFile, header)
+        writer.writeheader()
+        for row in store.scan(where=where):
+            writer.writerow(row)
+            count += 1
+    return count
+
+if cli.command == 'merge':
+    count = mergeCsvs(cli.in_files, cli.out_file)
+    pipedPrint("Merged", count, "rows from", len(cli.in_files), "files into", cli.out_file)
+
+elif cli.command == 'import':
+    store = ColumnStore(cli.store)
+    for path in cli.in_files:
+        pipedPrint("Imported", store.importCsv(path), "rows from", path)
+
+elif cli.command == 'analyze':
+    columns, count = analyze.loadResults(cli.in_files)
+    results = analyze.Results(columns, count)
+    metric = cli.metric or ('runtime' if 'runtime' in columns else 'wall_s')
+    if metric not in columns:
+        parser.error("No column " + metric + " in the results")
+    by = [k.strip() for k in cli.by.split(',')] if cli.by else [k for k in analyze.LABELS if k in columns]
+    missing = [k for k in by if k not in columns]
+    if missing:
+        parser.error("No column(s) " + ', '.join(missing) + " in the results")
+    reports = cli.report or [r for r, col in [('vertices', 'start_vtx'), ('speedup', 'processor'), ('efficiency', 'threads')] if col in columns]
+    tables = []
+    if 'vertices' in reports:
+        tables.append(('vertices', analyze.startVertexTable(results, metric, by)))
+    if 'speedup' in reports:
+        rows, summary = analyze.speedupTable(results, metric, by, baseline=cli.baseline, target=cli.target)
+        tables += [('speedup', rows), ('speedup_geomean', summary)]
+    if 'efficiency' in reports:
+        tables.append(('efficiency', analyze.efficiencyTable(results, metric, by)))
+    pipedPrint("Analyzed", count, "rows,", metric, "by", ', '.join(by), "(numpy)" if analyze.numpy is not None else "(no numpy, pure Python)")
+    outputTables(tables, cli.out_dir)
+
+elif cli.command == 'compare':
+    base, baseCount = analyze.loadResults(cli.baseline)
+    new, newCount = analyze.loadResults(cli.new)
+    metric = cli.metric or ('runtime' if 'runtime' in base and 'runtime' in new else 'wall_s')
+    if metric not in base or metric not in new:
+        parser.error("Both result sets need a " + metric + " column")
+    keys = compare.sharedKeys(base, new, [k.strip() for k in cli.by.split(',')] if cli.by else None)
+    if not keys:
+        parser.error("The result sets share no label columns")
+    rows = compare.compareConfigs(compare.samples(base, baseCount, keys, metric), compare.samples(new, newCount, keys, metric),
+                                  keys, cli.alpha, cli.threshold, cli.higher_is_better)
+    apps = compare.summarizeApps(rows)
+    regressions = sum(1 for r in rows if r['verdict'] == compare.VERDICT_REGRESSION)
+    listed = rows if cli.all else [r for r in rows if r['verdict'] in (compare.VERDICT_REGRESSION, compare.VERDICT_IMPROVEMENT)]
+    pipedPrint("Compared", len(rows), "configs on", metric, "by", ', '.join(keys) + ":", regressions, "regressions,",
+               sum(1 for r in rows if r['verdict'] == compare.VERDICT_IMPROVEMENT), "improvements")
+    outputTables([('compare', listed), ('compare_apps', apps)], cli.out_dir)
+    if regressions > cli.max_regressions:
+        sys.exit(1)
+    untested = sum(1 for r in rows if r['verdict'] == compare.VERDICT_UNTESTED)
+    if rows and untested > cli.max_untested * len(rows):
+        pipedPrint("Warning:", untested, "of", len(rows), "configs have fewer than two runs on a side and were not tested; "
+                   "pass several result files per side or compare --by fewer labels")
+        sys.exit(2)
+
+elif cli.command == 'export':
+    where = dict(cli.where or [])
+    count = exportStore(ColumnStore(cli.store), cli.out_file, where)
+    pipedPrint("Exported", count, "rows to", cli.out_file)
+
+elif cli.command == 'reextract':
+    try:
+        metrics = [Metric.parse(spec) for spec in cli.metric or []]
+    except ValueError as e:
+        parser.error(str(e))
+    where = dict(cli.where or [])
+    writer = UnionCSVWriter(cli.out_file)
+    count, skipped = reextract(OutputArchive(cli.archive), writer, metrics, cli.keep_metrics, cli.capture_all, where, cli.jobs)
+    writer.close()
+    pipedPrint("Re-extracted", count, "runs from", cli.archive, "into", cli.out_file)
+    if skipped:
+        pipedPrint("Warning:", skipped, "runs were archived without a describable extractor; give --metric to extract from them")